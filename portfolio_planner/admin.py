@@ -7,8 +7,11 @@ from rolepermissions.admin import RolePermissionsUserAdminMixin
 from .models import Agency
 from .models import BrandBusinessUnit
 from .models import Brand
+from .models import BrandPortfolioSnapshot
+from .models import BrandVisibility
 from .models import Product
 from .models import FiscalYear
+from .models import ImportRun
 from .models import MediaGroup
 from .models import Opportunity
 from .models import OpportunityPerformance
@@ -62,6 +65,29 @@ class BrandBusinessUnitAdmin(admin.ModelAdmin):
     raw_id_fields = ('user', 'brand',)
 
 
+@admin.register(BrandPortfolioSnapshot)
+class BrandPortfolioSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('brand', 'fiscal_year', 'grow_bucket', 'total_target', 'total_revenue_last_fiscal', 'modified')
+    list_filter = ('fiscal_year', 'grow_bucket',)
+    search_fields = ('brand__name',)
+    raw_id_fields = ('brand',)
+
+
+@admin.register(BrandVisibility)
+class BrandVisibilityAdmin(admin.ModelAdmin):
+    list_display = ('user', 'brand')
+    list_filter = ('user',)
+    search_fields = ('user__email', 'brand__name',)
+    raw_id_fields = ('user', 'brand',)
+
+
+@admin.register(ImportRun)
+class ImportRunAdmin(admin.ModelAdmin):
+    list_display = ('command', 'file_name', 'status', 'last_line', 'row_count', 'created', 'modified')
+    list_filter = ('command', 'status',)
+    search_fields = ('file_name', 'file_hash')
+
+
 @admin.register(OrgBusinessUnit)
 class OrgBusinessUnitAdmin(admin.ModelAdmin):
     list_display = ('name', 'status', 'business_unit_manager')
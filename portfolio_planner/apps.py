@@ -7,5 +7,6 @@ class PortfolioPlannerConfig(AppConfig):
     verbose_name = 'Portfolio Planner'
 
     def ready(self):
-        # Ensure signals are wired up
+        # Ensure signals and checks are wired up
+        import portfolio_planner.checks
         import portfolio_planner.signals
@@ -0,0 +1,25 @@
+"""System checks for the Portfolio Planner settings."""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from portfolio_planner.versions import is_cache_shared
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Warn when a production deployment does not share its cache between processes.
+
+    Cached role scopes are invalidated through the cache, so with a per process cache a user whose role or brands are
+    revoked keeps them on the other instances until their cached scope expires.
+    """
+    if settings.DEBUG or is_cache_shared():
+        return []
+
+    return [
+        Warning(
+            'The default cache is not shared between processes, so role and brand changes only reach the other '
+            f'instances after LOCAL_ROLE_SCOPE_CACHE_TIMEOUT ({settings.LOCAL_ROLE_SCOPE_CACHE_TIMEOUT}) seconds.',
+            hint='Set CACHE_URL to a shared cache, such as redis://...',
+            id='portfolio_planner.W001',
+        )
+    ]
@@ -0,0 +1,187 @@
+"""Management command to benchmark the Opportunity revenue annotations."""
+import random
+from decimal import Decimal
+from statistics import median
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Subquery, OuterRef, Sum, Value, Q, DecimalField
+from django.db.models.functions import Coalesce
+from djmoney.models.fields import MoneyField
+
+from portfolio_planner.models import Brand
+from portfolio_planner.models import FiscalYear
+from portfolio_planner.models import Opportunity
+from portfolio_planner.models import OpportunityPerformance
+from portfolio_planner.models import OpportunityRevenueRollup
+from portfolio_planner.models import OrgBusinessUnit
+from portfolio_planner.models import PeriodPerformance
+from portfolio_planner.models import Product
+from portfolio_planner.models import QUARTER_PERIODS
+from portfolio_planner.models import User
+
+# Each benchmark opportunity gets performance history in both fiscal years
+PERIOD_ROWS_PER_OPPORTUNITY = 2 * 12
+
+
+def legacy_with_revenue(queryset, fiscal_year):
+    """The original implementation of `OpportunityQuerySet.with_revenue`, kept for comparison.
+
+    Annotates total revenue over an unscoped join, and each quarter with its own correlated subquery.
+    """
+    zero_value = Value(Decimal('0.00'), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+    def quarterly_revenue_subquery(quarter):
+        return Subquery(
+            OpportunityPerformance.objects.filter(
+                opportunity=OuterRef('pk'),
+                fiscal_year=fiscal_year
+            ).annotate(
+                quarterly_revenue=Coalesce(Sum(
+                    'periods__revenue',
+                    filter=Q(periods__period__in=QUARTER_PERIODS[quarter]),
+                    output_field=MoneyField(max_digits=14, decimal_places=2, default_currency='ZAR')
+                ), zero_value)
+            ).values('quarterly_revenue')[:1]
+        )
+
+    return queryset.annotate(
+        total_revenue=Coalesce(Sum('opportunityperformance__periods__revenue',
+                                   output_field=DecimalField(max_digits=14, decimal_places=2)), zero_value),
+        q1_revenue=quarterly_revenue_subquery(1),
+        q2_revenue=quarterly_revenue_subquery(2),
+        q3_revenue=quarterly_revenue_subquery(3),
+        q4_revenue=quarterly_revenue_subquery(4),
+    )
+
+
+IMPLEMENTATIONS = {
+    'legacy': legacy_with_revenue,
+    'current': lambda queryset, fiscal_year: queryset.with_revenue(fiscal_year),
+}
+
+# The shapes the revenue annotations are used in on the portfolio planner, home and dashboard pages
+WORKLOADS = {
+    'aggregate': lambda queryset: queryset.aggregate(Sum('total_revenue')),
+    'first page': lambda queryset: list(queryset.order_by('id')[:20]),
+    'sorted page': lambda queryset: list(queryset.order_by('-total_revenue')[:20]),
+}
+
+
+class Command(BaseCommand):
+    """Benchmarks OpportunityQuerySet.with_revenue against the original implementation.
+
+    Generates synthetic opportunities and performance history inside a transaction, times the revenue annotations at
+    each size, and rolls everything back afterwards.
+    """
+    help = 'Benchmarks the Opportunity revenue annotations at increasing numbers of period performance rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[10_000, 100_000, 1_000_000],
+            help='Numbers of period performance rows to benchmark at'
+        )
+        parser.add_argument('--repeat', type=int, default=5, help='Number of timed runs for each query')
+        parser.add_argument('--seed', type=int, default=42, help='Seed for the synthetic data')
+
+    def handle(self, *args, **kwargs):
+        sizes = sorted(kwargs['sizes'])
+        if not sizes or sizes[0] < PERIOD_ROWS_PER_OPPORTUNITY:
+            raise CommandError(f'Sizes must be at least {PERIOD_ROWS_PER_OPPORTUNITY} period performance rows')
+
+        self.random = random.Random(kwargs['seed'])
+        self.repeat = kwargs['repeat']
+
+        with transaction.atomic():
+            self.create_master_data()
+
+            for size in sizes:
+                self.grow_to(size)
+                self.stdout.write(self.style.SUCCESS(f'{self.period_count:,} period performance rows'))
+
+                for workload_name, workload in WORKLOADS.items():
+                    timings = {
+                        name: self.time(workload, implementation)
+                        for name, implementation in IMPLEMENTATIONS.items()
+                    }
+                    speedup = timings['legacy'] / timings['current'] if timings['current'] else 0
+                    self.stdout.write(
+                        f"  {workload_name:<12} legacy {timings['legacy']:>10.1f} ms  "
+                        f"current {timings['current']:>10.1f} ms  ({speedup:.1f}x)"
+                    )
+
+            # Never keep the synthetic data
+            transaction.set_rollback(True)
+
+    def create_master_data(self):
+        """Create the fiscal years, users, brands and products the opportunities hang off."""
+        self.last_fiscal_year, self.fiscal_year = FiscalYear.objects.bulk_create(
+            [FiscalYear(year=9998), FiscalYear(year=9999)]
+        )
+        user = User.objects.create(email='benchmark@example.com')
+        org_business_unit = OrgBusinessUnit.objects.bulk_create(
+            [OrgBusinessUnit(name='Benchmark Business Unit', business_unit_manager=user)]
+        )[0]
+        self.brands = Brand.objects.bulk_create([
+            Brand(name=f'Benchmark Brand {number}', user=user, org_business_unit=org_business_unit)
+            for number in range(100)
+        ])
+        self.product = Product.objects.bulk_create([Product(name='Benchmark Product')])[0]
+        self.period_count = 0
+
+    def grow_to(self, size: int, batch_size: int = 2000):
+        """Add opportunities with performance history until there are `size` period performance rows."""
+        remaining = (size - self.period_count) // PERIOD_ROWS_PER_OPPORTUNITY
+
+        while remaining > 0:
+            batch = min(batch_size, remaining)
+            opportunities = Opportunity.objects.bulk_create([
+                Opportunity(
+                    brand=self.random.choice(self.brands),
+                    product=self.product,
+                    target=Decimal(self.random.randint(10_000, 1_000_000)),
+                    fiscal_year=self.fiscal_year,
+                    status=self.random.choice(['active', 'won', 'lost']),
+                )
+                for _ in range(batch)
+            ])
+            performances = OpportunityPerformance.objects.bulk_create([
+                OpportunityPerformance(opportunity=opportunity, fiscal_year=fiscal_year)
+                for opportunity in opportunities
+                for fiscal_year in (self.last_fiscal_year, self.fiscal_year)
+            ])
+            PeriodPerformance.objects.bulk_create([
+                PeriodPerformance(
+                    opportunity_performance=performance,
+                    period=period,
+                    revenue=Decimal(self.random.randint(0, 100_000)),
+                    fiscal_year=performance.fiscal_year,
+                )
+                for performance in performances
+                for period in range(1, 13)
+            ], batch_size=5000)
+            OpportunityRevenueRollup.objects.refresh(
+                OpportunityPerformance.objects.filter(pk__in=[performance.pk for performance in performances])
+            )
+
+            remaining -= batch
+            self.period_count += batch * PERIOD_ROWS_PER_OPPORTUNITY
+
+    def time(self, workload, implementation) -> float:
+        """Get the median time in milliseconds to run the workload with the implementation."""
+        queryset = Opportunity.objects.filter(fiscal_year=self.fiscal_year, status__in=['active', 'won'])
+
+        # Warm up the caches before timing
+        workload(implementation(queryset, self.last_fiscal_year))
+
+        timings = []
+        for _ in range(self.repeat):
+            started = perf_counter()
+            workload(implementation(queryset, self.last_fiscal_year))
+            timings.append((perf_counter() - started) * 1000)
+
+        return median(timings)
@@ -0,0 +1,77 @@
+"""Management command to benchmark running deployments of the site, such as WSGI against ASGI."""
+from concurrent.futures import ThreadPoolExecutor
+from statistics import mean, quantiles
+from time import perf_counter
+from urllib.error import HTTPError, URLError
+from urllib.parse import urljoin
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """Benchmarks the same pages on one or more running deployments.
+
+    Requests each path concurrently, as a logged in user, and reports the latency percentiles and throughput for each
+    deployment side by side. For example, to compare the WSGI and ASGI servers, start one of each against the same
+    database (the second with ASGI=true) and log in to get a session cookie:
+
+        python manage.py benchmark_servers http://localhost:8000 http://localhost:8001 --session <sessionid>
+    """
+    help = 'Benchmarks pages on running deployments, for example to compare WSGI and ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('base_urls', nargs='+', type=str, help='Base URLs of the deployments to compare')
+        parser.add_argument(
+            '--paths',
+            nargs='+',
+            default=['/', '/dashboard/all/', '/dashboard/top_brands/', '/dashboard/grow_status/'],
+            help='Paths to request on each deployment'
+        )
+        parser.add_argument('--session', type=str, required=True, help='Session ID cookie of a logged in user')
+        parser.add_argument('--requests', type=int, default=100, help='Number of requests for each path')
+        parser.add_argument('--concurrency', type=int, default=8, help='Number of requests to make at the same time')
+
+    def handle(self, *args, **kwargs):
+        if kwargs['requests'] < 2:
+            raise CommandError('At least 2 requests are needed for percentiles')
+
+        self.session = kwargs['session']
+
+        for path in kwargs['paths']:
+            self.stdout.write(self.style.SUCCESS(path))
+            for base_url in kwargs['base_urls']:
+                url = urljoin(base_url, path)
+                self.fetch(url)  # Warm up, so the first request's connections and caches are not counted
+
+                started = perf_counter()
+                with ThreadPoolExecutor(max_workers=kwargs['concurrency']) as executor:
+                    results = list(executor.map(self.fetch, [url] * kwargs['requests']))
+                elapsed = perf_counter() - started
+
+                timings = [milliseconds for milliseconds, ok in results if ok]
+                errors = len(results) - len(timings)
+                if len(timings) < 2:
+                    self.stdout.write(self.style.ERROR(f"  {base_url:<32} {errors} of {len(results)} requests failed"))
+                    continue
+
+                percentiles = quantiles(timings, n=100)
+                self.stdout.write(
+                    f"  {base_url:<32} p50 {percentiles[49]:>8.1f} ms  p95 {percentiles[94]:>8.1f} ms  "
+                    f"p99 {percentiles[98]:>8.1f} ms  mean {mean(timings):>8.1f} ms  "
+                    f"{len(results) / elapsed:>7.1f} req/s"
+                )
+                if errors:
+                    self.stdout.write(self.style.WARNING(f"  {errors} of {len(results)} requests failed"))
+
+    def fetch(self, url: str) -> tuple:
+        """Request the URL, returning how long it took in milliseconds and whether it succeeded."""
+        request = Request(url, headers={'Cookie': f'sessionid={self.session}', 'HX-Request': 'true'})
+        started = perf_counter()
+        try:
+            with urlopen(request) as response:
+                response.read()
+                ok = response.status == 200 and not response.url.rstrip('/').endswith('/login')
+        except (HTTPError, URLError):
+            ok = False
+        return (perf_counter() - started) * 1000, ok
@@ -0,0 +1,248 @@
+"""Management command to benchmark the hot views and querysets for each role, and check them for regressions."""
+import json
+from statistics import mean, quantiles
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+from portfolio_planner.models import Brand
+from portfolio_planner.models import Opportunity
+from portfolio_planner.models import User
+from portfolio_planner.scopes import ROLE_PRECEDENCE, get_role_scope
+from portfolio_planner.versions import DASHBOARD, bump_version
+from portfolio_planner.views.dashboard import DashboardView
+from portfolio_planner.views.helpers.brands import get_brand_role_filters
+from portfolio_planner.views.helpers.fiscal_years import get_current_and_last_fiscal_year
+from portfolio_planner.views.helpers.opportunities import role_based_opportunities
+from portfolio_planner.views.home import HomeOrLoginView
+from portfolio_planner.views.opportunity import OpportunityListView
+
+# The dashboard actions, each requested as its own HTMX fragment
+DASHBOARD_ACTIONS = ('all', 'top_brands', 'grow_status', 'brand_table', 'time_remaining', 'opportunities_status')
+
+# The number of opportunities the queryset benchmarks fetch, the same as a page of a table
+PAGE_SIZE = 20
+
+# The timings compared against the baseline. The number of queries is compared too, and must not grow at all
+COMPARED_TIMINGS = ('p50', 'p95')
+
+
+def render(response):
+    """Render a template response, so its rendering is timed along with the view."""
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    if response.status_code != 200:
+        raise CommandError(f'Got a {response.status_code} response')
+    return response
+
+
+def with_revenue(request):
+    """A page of the role's opportunities for the current fiscal year, sorted by last fiscal year's revenue."""
+    current_fiscal_year, last_fiscal_year = get_current_and_last_fiscal_year()
+    opportunities = Opportunity.objects.filter(fiscal_year=current_fiscal_year, status__in=['active', 'won'])
+    if request.role_scope.brand_ids is not None:
+        opportunities = opportunities.filter(brand_id__in=request.role_scope.brand_ids)
+    return list(opportunities.with_revenue(last_fiscal_year).order_by('-total_revenue', 'pk')[:PAGE_SIZE])
+
+
+def opportunities_page(request):
+    """The first page of the role based opportunities, as the opportunity list fetches it."""
+    return list(role_based_opportunities(request.role_scope).order_by('pk')[:PAGE_SIZE])
+
+
+def prepare_dashboard_data(request):
+    view = DashboardView()
+    view.setup(request)
+    view.queryset = Brand.objects.filter(**get_brand_role_filters(request.role_scope))
+    view.prepare_data(request)
+
+
+def dashboard_action(action: str):
+    view = DashboardView.as_view()
+    return lambda request: render(view(request, action=action))
+
+
+# The benchmarks, each the path it is requested for and a callable taking the GET request
+BENCHMARKS = {
+    'with_revenue': ('/opportunities/', with_revenue),
+    'role_based_opportunities': ('/opportunities/', opportunities_page),
+    'DashboardView.prepare_data': ('/dashboard/', prepare_dashboard_data),
+    **{
+        f'DashboardView.{action}': (f'/dashboard/{action}/', dashboard_action(action))
+        for action in DASHBOARD_ACTIONS
+    },
+    'HomeOrLoginView': ('/', lambda request: render(HomeOrLoginView.as_view()(request))),
+    'OpportunityListView': ('/opportunities/', lambda request: render(OpportunityListView.as_view()(request))),
+}
+
+
+class Command(BaseCommand):
+    """Benchmarks the hot views and querysets as a user in each role.
+
+    Each benchmark is run as the user with the most visible brands in each of the Account Manager, Business Unit Head
+    and Sales Director roles, so run it against a realistic dataset, such as one from generate_synthetic_data. The
+    views are called directly with their responses rendered, without the middleware.
+
+    Reports the latency percentiles and the number of queries of each benchmark, and can save them as JSON. Given the
+    JSON of an earlier run as a baseline, fails if any benchmark got slower by more than the threshold, or runs more
+    queries:
+
+        python manage.py benchmark_views --output baseline.json
+        python manage.py benchmark_views --baseline baseline.json --threshold 20
+
+    The dashboard data is invalidated before each run, so the dashboard is measured uncached. Use `--cached` to measure
+    it served from the cache instead. Invalidating it also invalidates the dashboard for every user sharing the cache.
+    """
+    help = 'Benchmarks the hot views and querysets for each role, and compares them against a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Number of timed runs of each benchmark')
+        parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS.keys(), help='Only run these benchmarks')
+        parser.add_argument('--cached', action='store_true', help='Keep the cached dashboard data between runs')
+        parser.add_argument('--output', type=str, help='Path to save the results to as JSON')
+        parser.add_argument(
+            '--baseline',
+            type=str,
+            help='Path of the JSON results of an earlier run to compare against'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=20.0,
+            help='Percentage a benchmark may get slower than the baseline before it is a regression'
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs['repeat'] < 2:
+            raise CommandError('At least 2 runs are needed for percentiles')
+
+        baseline = None
+        if kwargs['baseline']:
+            try:
+                with open(kwargs['baseline']) as file:
+                    baseline = json.load(file)['results']
+            except (OSError, ValueError, KeyError) as error:
+                raise CommandError(f"Could not read the baseline {kwargs['baseline']}: {error}")
+
+        self.repeat = kwargs['repeat']
+        self.cached = kwargs['cached']
+        self.factory = RequestFactory()
+        benchmarks = {name: BENCHMARKS[name] for name in kwargs['benchmarks'] or BENCHMARKS}
+
+        results = {}
+        for role in ROLE_PRECEDENCE:
+            user = self.get_user(role)
+            if user is None:
+                self.stdout.write(self.style.WARNING(f'No user has the {role.get_name()} role, skipping it'))
+                continue
+
+            self.stdout.write(self.style.SUCCESS(f'{role.get_name()} ({user.email})'))
+            for name, (path, benchmark) in benchmarks.items():
+                result = self.run(user, path, benchmark)
+                results[f'{role.get_name()}:{name}'] = result
+                self.stdout.write(
+                    f"  {name:<36} p50 {result['p50']:>8.1f} ms  p95 {result['p95']:>8.1f} ms  "
+                    f"p99 {result['p99']:>8.1f} ms  mean {result['mean']:>8.1f} ms  {result['queries']:>3} queries"
+                )
+
+        if kwargs['output']:
+            with open(kwargs['output'], 'w') as file:
+                json.dump({
+                    'created': timezone.now().isoformat(),
+                    'database': connection.vendor,
+                    'opportunities': Opportunity.objects.count(),
+                    'repeat': self.repeat,
+                    'cached': self.cached,
+                    'results': results,
+                }, file, indent=2)
+            self.stdout.write(f"Saved the results to {kwargs['output']}")
+
+        if baseline is not None:
+            self.compare(results, baseline, kwargs['threshold'])
+
+    @staticmethod
+    def get_user(role):
+        """Get the user in the role that can see the most brands, who are not scoped by a role taking precedence."""
+        higher_roles = [other.get_name() for other in ROLE_PRECEDENCE[:ROLE_PRECEDENCE.index(role)]]
+        return User.objects.filter(
+            groups__name=role.get_name(),
+            is_active=True,
+        ).exclude(
+            groups__name__in=higher_roles,
+        ).annotate(
+            brand_count=Count('brand_visibility'),
+        ).order_by('-brand_count', 'pk').first()
+
+    def request(self, user, path: str):
+        """Build an HTMX GET request for the path as the user, as the middleware would."""
+        request = self.factory.get(path, HTTP_HX_REQUEST='true')
+        request.user = user
+        request.role_scope = SimpleLazyObject(lambda: get_role_scope(user))
+        return request
+
+    def run(self, user, path: str, benchmark) -> dict:
+        """Run the benchmark once to warm up, then time it, returning its percentiles in milliseconds."""
+        timings = []
+        queries = 0
+        for run in range(self.repeat + 1):
+            if not self.cached:
+                bump_version(DASHBOARD)
+            # The scope is kept on the user for the life of a request, so is looked up again as it would be
+            user.__dict__.pop('_role_scope', None)
+            request = self.request(user, path)
+
+            with CaptureQueriesContext(connection) as context:
+                started = perf_counter()
+                benchmark(request)
+                elapsed = (perf_counter() - started) * 1000
+
+            if run:
+                timings.append(elapsed)
+                queries = max(queries, len(context.captured_queries))
+
+        percentiles = quantiles(timings, n=100)
+        return {
+            'p50': percentiles[49],
+            'p95': percentiles[94],
+            'p99': percentiles[98],
+            'mean': mean(timings),
+            'min': min(timings),
+            'max': max(timings),
+            'queries': queries,
+        }
+
+    def compare(self, results: dict, baseline: dict, threshold: float):
+        """Compare the results against the baseline, failing if any benchmark regressed."""
+        self.stdout.write(self.style.SUCCESS(f'Compared to the baseline, with a {threshold:g}% threshold'))
+
+        regressions = []
+        for name, result in results.items():
+            expected = baseline.get(name)
+            if expected is None:
+                self.stdout.write(f'  {name:<56} not in the baseline')
+                continue
+
+            changes = []
+            for timing in COMPARED_TIMINGS:
+                change = (result[timing] / expected[timing] - 1) * 100 if expected[timing] else 0
+                changes.append(f'{timing} {change:>+7.1f}%')
+                if change > threshold:
+                    regressions.append(f'{name} {timing} {expected[timing]:.1f} ms -> {result[timing]:.1f} ms')
+            if result['queries'] > expected['queries']:
+                regressions.append(f"{name} queries {expected['queries']} -> {result['queries']}")
+            changes.append(f"queries {expected['queries']:>3} -> {result['queries']:>3}")
+
+            self.stdout.write(f"  {name:<56} {'  '.join(changes)}")
+
+        if regressions:
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(f'  Regressed: {regression}'))
+            raise CommandError(f'Found {len(regressions)} regressions against the baseline')
+
+        self.stdout.write(self.style.SUCCESS('No regressions'))
@@ -0,0 +1,357 @@
+"""Management command to generate a synthetic dataset for performance testing."""
+import random
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate
+from math import ceil
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from portfolio_planner.management.helpers.copy import insert_rows
+from portfolio_planner.models import Agency
+from portfolio_planner.models import Brand
+from portfolio_planner.models import BrandBusinessUnit
+from portfolio_planner.models import FiscalYear
+from portfolio_planner.models import MediaGroup
+from portfolio_planner.models import Opportunity
+from portfolio_planner.models import OpportunityPerformance
+from portfolio_planner.models import OpportunityRevenueRollup
+from portfolio_planner.models import OrgBusinessUnit
+from portfolio_planner.models import PeriodPerformance
+from portfolio_planner.models import Product
+from portfolio_planner.models import QUARTER_PERIODS
+from portfolio_planner.models import User
+from portfolio_planner.models import get_fiscal_calendar
+from sos.roles import AccountManager, BusinessUnitHead, SalesDirector
+
+
+# The number of opportunities for each scale
+SCALES = {
+    '1k': 1_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+}
+
+# Opportunity statuses and how common they are
+STATUS_WEIGHTS = {
+    'active': 60,
+    'won': 20,
+    'lost': 10,
+    'abandoned': 5,
+    'disabled': 3,
+    'expired': 2,
+}
+
+PRODUCT_COUNT = 25
+SALES_DIRECTOR_COUNT = 2
+
+# Every synthetic user's email starts with this, so the command can tell if it has already been run
+EMAIL_PREFIX = 'synthetic-'
+
+
+class Command(BaseCommand):
+    """Generates a synthetic dataset at a given scale.
+
+    Creates users in each role, organisation business units, media groups, agencies, brands, brand business units and
+    products, then opportunities spread over several fiscal years, each with 12 periods of performance history and its
+    revenue rollup. The same seed always generates the same data.
+
+    Brand sizes are skewed: the number of opportunities for the brand ranked n is proportional to 1 / n ** skew, so a
+    few brands are large and most are small. Use a skew of 0 for evenly sized brands.
+
+    The opportunities and their history are streamed into the database with COPY on PostgreSQL, so the 1m scale (12
+    million period rows) loads in minutes. Other databases fall back to bulk inserts. The brand snapshots and
+    visibility are rebuilt afterwards.
+    """
+    help = 'Generates a synthetic dataset of 1k, 100k or 1m opportunities for performance testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES.keys(), default='1k', help='Number of opportunities to generate')
+        parser.add_argument('--seed', type=int, default=42, help='Seed for the random data')
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.0,
+            help='How unevenly the opportunities are spread over the brands, 0 for evenly'
+        )
+        parser.add_argument(
+            '--fiscal-years',
+            type=int,
+            default=3,
+            help='Number of fiscal years to spread the opportunities over, up to and including the current one'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=20_000,
+            help='Number of opportunities to generate and load at a time'
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs['fiscal_years'] < 1:
+            raise CommandError('There must be at least one fiscal year')
+        if User.objects.filter(email__startswith=EMAIL_PREFIX).exists():
+            raise CommandError('Synthetic data has already been generated in this database')
+
+        self.random = random.Random(kwargs['seed'])
+        self.opportunity_count = SCALES[kwargs['scale']]
+        self.chunk_size = kwargs['chunk_size']
+        self.now = timezone.now()
+        self.today = timezone.localdate()
+
+        started = perf_counter()
+        with transaction.atomic():
+            self.stage('fiscal years', self.create_fiscal_years, kwargs['fiscal_years'])
+            self.stage('users', self.create_users)
+            self.stage('organisation business units', self.create_org_business_units)
+            self.stage('media groups and agencies', self.create_agencies)
+            self.stage('products', self.create_products)
+            self.stage('brands', self.create_brands, kwargs['skew'])
+            self.stage('brand business units', self.create_brand_business_units)
+            self.stage('opportunities and performance history', self.create_opportunities)
+            self.stage('sequences', self.reset_sequences)
+
+        self.stage('statistics', self.analyze)
+        self.stage('brand snapshots', call_command, 'rebuild_brand_snapshots', stdout=self.stdout)
+        self.stage('brand visibility', call_command, 'rebuild_brand_visibility', stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {self.opportunity_count:,} opportunities in {perf_counter() - started:.1f}s'
+        ))
+
+    def stage(self, name: str, function, *args, **kwargs):
+        started = perf_counter()
+        function(*args, **kwargs)
+        self.stdout.write(f'  {name:<40} {perf_counter() - started:>8.1f}s')
+
+    def create_fiscal_years(self, count: int):
+        """Use the current fiscal year and those before it, creating any that are missing."""
+        try:
+            current_year = get_fiscal_calendar().current.year
+        except FiscalYear.DoesNotExist:
+            current_year = self.today.year
+            if self.today.month < settings.FISCAL_YEAR_START_MONTH:
+                current_year -= 1
+
+        self.fiscal_years = []
+        for year in range(current_year - count + 1, current_year + 1):
+            fiscal_year, _ = FiscalYear.objects.get_or_create(year=year)
+            if year == current_year and not fiscal_year.is_current:
+                fiscal_year.is_current = True
+                fiscal_year.save()
+            self.fiscal_years.append(fiscal_year)
+
+    def create_users(self):
+        """Create the users, and assign them their roles."""
+        password = make_password(None)
+        brand_count = self.brand_count()
+        self.account_managers = self.create_role_users(AccountManager, 'am', max(5, brand_count // 100), password)
+        self.business_unit_heads = self.create_role_users(
+            BusinessUnitHead, 'buh', max(2, len(self.account_managers) // 10), password
+        )
+        self.sales_directors = self.create_role_users(SalesDirector, 'sd', SALES_DIRECTOR_COUNT, password)
+
+    def create_role_users(self, role, code: str, count: int, password: str) -> list:
+        group, _ = Group.objects.get_or_create(name=role.get_name())
+        users = User.objects.bulk_create([
+            User(
+                email=f'{EMAIL_PREFIX}{code}-{number}@example.com',
+                first_name=f'Synthetic {code.upper()}',
+                last_name=str(number),
+                password=password,
+            )
+            for number in range(count)
+        ])
+        User.groups.through.objects.bulk_create([User.groups.through(user=user, group=group) for user in users])
+        return users
+
+    def create_org_business_units(self):
+        """Create one organisation business unit for each Business Unit Head."""
+        self.org_business_units = OrgBusinessUnit.objects.bulk_create([
+            OrgBusinessUnit(name=f'Synthetic Business Unit {number}', business_unit_manager=user)
+            for number, user in enumerate(self.business_unit_heads)
+        ])
+
+    def create_agencies(self):
+        brand_count = self.brand_count()
+        media_groups = MediaGroup.objects.bulk_create([
+            MediaGroup(name=f'Synthetic Media Group {number}') for number in range(max(2, brand_count // 2000))
+        ])
+        self.agencies = Agency.objects.bulk_create([
+            Agency(name=f'Synthetic Agency {number}', media_group=self.random.choice(media_groups))
+            for number in range(max(5, brand_count // 100))
+        ])
+
+    def create_products(self):
+        self.products = Product.objects.bulk_create([
+            Product(name=f'Synthetic Product {number}') for number in range(PRODUCT_COUNT)
+        ])
+
+    def brand_count(self) -> int:
+        return max(20, self.opportunity_count // 20)
+
+    def create_brands(self, skew: float):
+        """Create the brands, and decide how many opportunities each one gets."""
+        brand_count = self.brand_count()
+
+        # Each account manager's brands are managed by one business unit
+        brands = []
+        for number in range(brand_count):
+            account_manager_number = self.random.randrange(len(self.account_managers))
+            brands.append(Brand(
+                name=f'Synthetic Brand {number}',
+                client_code=f'SYN{number:07d}',
+                status='active' if self.random.random() < 0.95 else 'disabled',
+                user=self.account_managers[account_manager_number],
+                agency=self.random.choice(self.agencies) if self.random.random() < 0.8 else None,
+                org_business_unit=self.org_business_units[account_manager_number % len(self.org_business_units)],
+            ))
+        self.brands = Brand.objects.bulk_create(brands, batch_size=5000)
+
+        # The brand ranked n gets a share of the opportunities proportional to 1 / n ** skew
+        cumulative_weights = list(accumulate(1 / rank ** skew for rank in range(1, brand_count + 1)))
+        self.brand_opportunity_counts = Counter(
+            self.random.choices(range(brand_count), cum_weights=cumulative_weights, k=self.opportunity_count)
+        )
+
+    def create_brand_business_units(self):
+        """Create enough business units for each brand to hold its opportunities.
+
+        An opportunity is unique for its brand, business unit, product and fiscal year, so a large brand needs more
+        business units.
+        """
+        business_units = []
+        for index, brand in enumerate(self.brands):
+            per_year = ceil(self.brand_opportunity_counts[index] / len(self.fiscal_years))
+            for number in range(max(1, ceil(per_year / PRODUCT_COUNT))):
+                business_units.append(BrandBusinessUnit(
+                    name=f'Synthetic Business Unit {number}',
+                    brand=brand,
+                    user_id=brand.user_id,
+                ))
+
+        business_units = BrandBusinessUnit.objects.bulk_create(business_units, batch_size=5000)
+
+        self.brand_business_units = {}
+        for business_unit in business_units:
+            self.brand_business_units.setdefault(business_unit.brand_id, []).append(business_unit.pk)
+
+    def opportunity_slots(self):
+        """Yield the brand, business unit, product and fiscal year of every opportunity."""
+        for index, brand in enumerate(self.brands):
+            count = self.brand_opportunity_counts[index]
+            business_unit_ids = self.brand_business_units[brand.pk]
+            for year_index, fiscal_year in enumerate(self.fiscal_years):
+                # Spread the brand's opportunities over the years, with any remainder in the latest years
+                year_count = count // len(self.fiscal_years)
+                year_count += year_index >= len(self.fiscal_years) - count % len(self.fiscal_years)
+
+                combinations = len(business_unit_ids) * PRODUCT_COUNT
+                for slot in self.random.sample(range(combinations), year_count):
+                    business_unit_id = business_unit_ids[slot // PRODUCT_COUNT]
+                    product_id = self.products[slot % PRODUCT_COUNT].pk
+                    yield brand, business_unit_id, product_id, fiscal_year
+
+    def create_opportunities(self):
+        """Stream the opportunities, their performance history and revenue rollups into the database in chunks."""
+        opportunity_id = (Opportunity.objects.order_by('-pk').values_list('pk', flat=True).first() or 0)
+        performance_id = (OpportunityPerformance.objects.order_by('-pk').values_list('pk', flat=True).first() or 0)
+        approvers = {
+            org_business_unit.pk: org_business_unit.business_unit_manager_id
+            for org_business_unit in self.org_business_units
+        }
+        statuses, status_weights = list(STATUS_WEIGHTS), list(accumulate(STATUS_WEIGHTS.values()))
+        current_fiscal_year = self.fiscal_years[-1]
+        current_period = (self.today.month - settings.FISCAL_YEAR_START_MONTH) % 12 + 1
+
+        opportunities, performances, periods, rollups = [], [], [], []
+        loaded = 0
+
+        for brand, business_unit_id, product_id, fiscal_year in self.opportunity_slots():
+            opportunity_id += 1
+            performance_id += 1
+
+            status = self.random.choices(statuses, cum_weights=status_weights)[0]
+            start = date(fiscal_year.year, settings.FISCAL_YEAR_START_MONTH, 1)
+            status_date = min(start + timedelta(days=self.random.randrange(365)), self.today)
+            approved = self.random.random() < 0.7
+            target = Decimal(round(self.random.lognormvariate(11, 1), 2)).quantize(Decimal('0.01'))
+
+            opportunities.append((
+                opportunity_id, self.now, self.now, status, self.now,
+                status_date if status == 'won' else None,
+                status_date if status == 'lost' else None,
+                status_date if status == 'abandoned' else None,
+                status_date if status == 'disabled' else None,
+                status_date if status == 'expired' else None,
+                brand.pk, business_unit_id, product_id, target, 'ZAR', fiscal_year.pk,
+                approved, status_date if approved else None, approvers[brand.org_business_unit_id] if approved else None,
+            ))
+            performances.append((performance_id, opportunity_id, fiscal_year.pk))
+
+            # Revenue is spread unevenly over the periods, with none yet for the rest of the current fiscal year
+            total = float(target) * self.random.uniform(0.3, 1.2)
+            weights = [self.random.random() for _ in range(12)]
+            if fiscal_year == current_fiscal_year:
+                weights = [weight if period <= current_period else 0 for period, weight in enumerate(weights, 1)]
+            revenues = [
+                Decimal(round(total * weight / sum(weights), 2)).quantize(Decimal('0.01')) for weight in weights
+            ]
+            for period, revenue in enumerate(revenues, 1):
+                periods.append((performance_id, period, revenue, 'ZAR', fiscal_year.pk))
+
+            quarters = [sum(revenues[period - 1] for period in QUARTER_PERIODS[quarter]) for quarter in range(1, 5)]
+            rollups.append((opportunity_id, fiscal_year.pk, *revenues, *quarters, sum(revenues)))
+
+            if len(opportunities) >= self.chunk_size:
+                loaded += self.load(opportunities, performances, periods, rollups)
+                opportunities, performances, periods, rollups = [], [], [], []
+                self.stdout.write(f'    {loaded:,} of {self.opportunity_count:,} opportunities')
+
+        self.load(opportunities, performances, periods, rollups)
+
+    @staticmethod
+    def load(opportunities: list, performances: list, periods: list, rollups: list) -> int:
+        insert_rows(Opportunity, [
+            'id', 'created', 'modified', 'status', 'status_changed',
+            'won_date', 'lost_date', 'abandoned_date', 'disabled_date', 'expired_date',
+            'brand_id', 'business_unit_id', 'product_id', 'target', 'target_currency', 'fiscal_year_id',
+            'approved', 'approved_date', 'approval_user_id',
+        ], opportunities)
+        insert_rows(OpportunityPerformance, ['id', 'opportunity_id', 'fiscal_year_id'], performances)
+        insert_rows(
+            PeriodPerformance,
+            ['opportunity_performance_id', 'period', 'revenue', 'revenue_currency', 'fiscal_year_id'],
+            periods
+        )
+        insert_rows(
+            OpportunityRevenueRollup,
+            ['opportunity_id', 'fiscal_year_id', *OpportunityRevenueRollup.REVENUE_FIELDS],
+            rollups
+        )
+        return len(opportunities)
+
+    def reset_sequences(self):
+        """Move the sequences past the primary keys that were set explicitly."""
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Opportunity, OpportunityPerformance]):
+                cursor.execute(sql)
+
+    def analyze(self):
+        """Update the planner statistics for the new rows."""
+        if connection.vendor != 'postgresql':
+            return
+
+        with connection.cursor() as cursor:
+            models = (Opportunity, OpportunityPerformance, PeriodPerformance, OpportunityRevenueRollup, Brand)
+            for model in models:
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
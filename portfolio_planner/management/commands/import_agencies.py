@@ -1,5 +1,6 @@
 """Management command to import agencies from a CSV file."""
 from django.core.management.base import BaseCommand, CommandError
+from portfolio_planner.management.helpers.imports import add_validate_argument, validate_or_raise
 from portfolio_planner.models import Agency, MediaGroup
 import csv
 
@@ -10,10 +11,22 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Path to the CSV file containing agency data')
+        add_validate_argument(parser)
+
+    def validate(self, rows, lookups):
+        """Yield an error for every row with an unknown media group."""
+        for line_number, row in rows:
+            media_group_name = row['Media Group']
+            if media_group_name and media_group_name not in lookups.media_groups:
+                yield line_number, f"Media Group {media_group_name} does not exist"
+            lookups.agencies.add(row['Name'])
 
     def handle(self, *args, **kwargs):
         csv_file_path = kwargs['csv_file']
 
+        if kwargs['validate']:
+            return validate_or_raise(self, csv_file_path)
+
         try:
             self.stdout.write(self.style.SUCCESS(f'Importing agencies from {csv_file_path}'))
             with open(csv_file_path, newline='', encoding='utf-8-sig') as csvfile:
@@ -0,0 +1,187 @@
+"""Management command to run all the CSV imports from a directory, in dependency order."""
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from io import StringIO
+from time import perf_counter
+
+from django.core.management import call_command, load_command_class
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from portfolio_planner.management.helpers.imports import ImportLookups, add_validate_argument, validate_file
+
+
+# Each stage is the import command, the CSV file it reads from the directory, and the stages it depends on
+STAGES = {
+    'users': ('import_users', 'users.csv', []),
+    'org_business_units': ('import_org_business_units', 'org_bus_units.csv', ['users']),
+    'media_groups': ('import_media_groups', 'media_groups.csv', []),
+    'products': ('import_products', 'products.csv', []),
+    'agencies': ('import_agencies', 'agencies.csv', ['media_groups']),
+    'brands': ('import_brands', 'brands.csv', ['users', 'org_business_units', 'agencies']),
+    'brand_business_units': ('import_brand_business_units', 'brand_bus.csv', ['users', 'brands']),
+    'opportunities': ('import_opportunities', 'opportunities.csv', ['users', 'products', 'brand_business_units']),
+    'performance_history': ('import_performance_history', 'performance_history.csv', ['opportunities']),
+}
+
+# The stages that can commit in checkpointed chunks, and the option of their command that turns it on
+CHUNKED_STAGES = {
+    'opportunities': 'batch',
+    'performance_history': 'chunked',
+}
+
+
+def run_stage(command: str, csv_file_path: str, options: dict, atomic: bool = True):
+    """Run an import command, returning its output, how long it took in seconds, and the error it failed with, if any.
+
+    The output is returned when the command fails too, as it reports what went wrong, such as the invalid lines and
+    where to resume from.
+
+    The command runs in its own transaction, unless `atomic` is False because it commits its own chunks. Its
+    checkpoints then stay committed if it fails, so it can be resumed.
+
+    Stages run on worker threads, each of which gets its own database connection, so it is closed once the stage is
+    done rather than left open for the life of the thread pool.
+    """
+    stdout = StringIO()
+    started = perf_counter()
+    error = None
+    try:
+        if atomic:
+            with transaction.atomic():
+                call_command(command, csv_file_path, stdout=stdout, **options)
+        else:
+            call_command(command, csv_file_path, stdout=stdout, **options)
+    except Exception as e:
+        error = e
+    finally:
+        connections.close_all()
+
+    return stdout.getvalue(), perf_counter() - started, error
+
+
+class Command(BaseCommand):
+    """Imports all the CSV files in a directory.
+
+    The import commands are run as a dependency graph, so independent stages such as media groups and agencies run
+    alongside users and organisation business units. Each stage runs in its own transaction; if one fails, the stages
+    that depend on it are not run. With `--batch`, the opportunities and performance history instead commit in
+    checkpointed chunks, and can be carried on from their last committed chunk with `--resume`.
+    """
+    help = 'Imports all the CSV files in a directory, running independent imports concurrently'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', type=str, help='Path to the directory containing the CSV files')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Maximum number of imports to run at the same time'
+        )
+        parser.add_argument(
+            '--batch',
+            action='store_true',
+            help='Import the opportunities and performance history in checkpointed chunks, see import_opportunities '
+                 '--batch and import_performance_history --chunked'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Resume the opportunities and performance history from their last committed chunks. Implies --batch'
+        )
+        add_validate_argument(parser)
+
+    def handle(self, *args, **kwargs):
+        directory = kwargs['directory']
+        if not os.path.isdir(directory):
+            raise CommandError(f'Directory "{directory}" does not exist')
+
+        if kwargs['validate']:
+            return self.validate(directory)
+
+        stage_options = {}
+        if kwargs['batch'] or kwargs['resume']:
+            stage_options = {
+                name: {option: True, 'resume': kwargs['resume']} for name, option in CHUNKED_STAGES.items()
+            }
+
+        pending = dict(STAGES)
+        running = {}
+        completed = set()
+        failed = set()
+        timings = {}
+
+        # Stages whose CSV is missing are skipped, on the basis that their data has already been loaded
+        for name, (_, file_name, _) in STAGES.items():
+            if not os.path.isfile(os.path.join(directory, file_name)):
+                self.stdout.write(self.style.WARNING(f"Skipping {name}: {file_name} not found in {directory}"))
+                completed.add(name)
+                del pending[name]
+
+        started = perf_counter()
+        with ThreadPoolExecutor(max_workers=kwargs['workers']) as executor:
+            while pending or running:
+                for name, (command, file_name, dependencies) in list(pending.items()):
+                    if failed.intersection(dependencies):
+                        self.stdout.write(self.style.WARNING(f"Skipping {name}: a stage it depends on failed"))
+                        failed.add(name)
+                        del pending[name]
+                    elif completed.issuperset(dependencies):
+                        self.stdout.write(self.style.SUCCESS(f"Starting {name}"))
+                        future = executor.submit(
+                            run_stage,
+                            command,
+                            os.path.join(directory, file_name),
+                            stage_options.get(name, {}),
+                            atomic=name not in stage_options,
+                        )
+                        running[future] = name
+                        del pending[name]
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    output, seconds, error = future.result()
+                    self.stdout.write(output, ending='')
+                    if error is not None:
+                        failed.add(name)
+                        self.stdout.write(self.style.ERROR(f"Failed {name}: {error}"))
+                        continue
+
+                    completed.add(name)
+                    timings[name] = seconds
+                    self.stdout.write(self.style.SUCCESS(f"Finished {name} in {timings[name]:.2f}s"))
+
+        self.stdout.write(self.style.SUCCESS('Stage timings:'))
+        for name, seconds in timings.items():
+            self.stdout.write(f"  {name:<22} {seconds:>8.2f}s")
+        self.stdout.write(self.style.SUCCESS(f"Total: {perf_counter() - started:.2f}s"))
+
+        if failed:
+            raise CommandError(f"Import failed or skipped for: {', '.join(sorted(failed))}")
+
+    def validate(self, directory: str):
+        """Validate every CSV in the directory without writing anything.
+
+        The files are validated one after another in dependency order, sharing one set of lookups, so a file can refer
+        to rows that an earlier file in the directory would create.
+        """
+        lookups = ImportLookups()
+        invalid = []
+
+        for name, (command, file_name, _) in STAGES.items():
+            csv_file_path = os.path.join(directory, file_name)
+            if not os.path.isfile(csv_file_path):
+                self.stdout.write(self.style.WARNING(f"Skipping {name}: {file_name} not found in {directory}"))
+                continue
+
+            stage = load_command_class('portfolio_planner', command)
+            stage.stdout, stage.style = self.stdout, self.style
+            if not validate_file(stage, csv_file_path, lookups):
+                invalid.append(name)
+
+        if invalid:
+            raise CommandError(f"Validation failed for: {', '.join(invalid)}")
@@ -1,6 +1,7 @@
 """Management command to import brand business units from a CSV file."""
 from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
+from portfolio_planner.management.helpers.imports import add_validate_argument, validate_or_raise
 from portfolio_planner.models import Brand, BrandBusinessUnit
 import csv
 
@@ -13,10 +14,23 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Path to the CSV file containing brand business unit data')
+        add_validate_argument(parser)
+
+    def validate(self, rows, lookups):
+        """Yield an error for every row with an unknown brand or user."""
+        for line_number, row in rows:
+            if row['Brand'] not in lookups.brands:
+                yield line_number, f"Brand with name {row['Brand']} does not exist"
+            if row['Email'] not in lookups.users:
+                yield line_number, f"User with email {row['Email']} does not exist"
+            lookups.brand_business_units.add((row['Brand'], row['Name']))
 
     def handle(self, *args, **kwargs):
         csv_file_path = kwargs['csv_file']
 
+        if kwargs['validate']:
+            return validate_or_raise(self, csv_file_path)
+
         try:
             self.stdout.write(self.style.SUCCESS(f'Importing brand business units from {csv_file_path}'))
             with open(csv_file_path, newline='', encoding='utf-8-sig') as csvfile:
@@ -1,6 +1,7 @@
 """Management command to import brands from a CSV file"""
 from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
+from portfolio_planner.management.helpers.imports import add_validate_argument, validate_or_raise
 from portfolio_planner.models import Brand, Agency, OrgBusinessUnit
 import csv
 
@@ -12,10 +13,25 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Path to the CSV file containing brand data')
+        add_validate_argument(parser)
+
+    def validate(self, rows, lookups):
+        """Yield an error for every row with an unknown user, agency or organisation business unit."""
+        for line_number, row in rows:
+            if row['Email'] not in lookups.users:
+                yield line_number, f"User with email {row['Email']} does not exist"
+            if row['Agency'] and row['Agency'] not in lookups.agencies:
+                yield line_number, f"Agency with name {row['Agency']} does not exist"
+            if row['Org BU'] not in lookups.org_business_units:
+                yield line_number, f"Organisation Business Unit with name {row['Org BU']} does not exist"
+            lookups.brands.add(row['Name'])
 
     def handle(self, *args, **kwargs):
         csv_file_path = kwargs['csv_file']
 
+        if kwargs['validate']:
+            return validate_or_raise(self, csv_file_path)
+
         try:
             self.stdout.write(self.style.SUCCESS(f'Importing brands from {csv_file_path}'))
             with open(csv_file_path, newline='', encoding='utf-8-sig') as csvfile:
@@ -1,9 +1,19 @@
 """Management command to import opportunities from a CSV file."""
+from datetime import date
+from time import perf_counter
+
 from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import F, Q
+from portfolio_planner.management.helpers.copy import copy_to_staging_table
+from portfolio_planner.management.helpers.imports import StreamingImport, parse_bool
+from portfolio_planner.management.helpers.imports import add_validate_argument, validate_or_raise
 from portfolio_planner.models import Opportunity, Brand, BrandBusinessUnit, Product, FiscalYear
+from portfolio_planner.models import BrandPortfolioSnapshot, OpportunityPerformance
 import csv
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 
 User = get_user_model()
 
@@ -12,12 +22,95 @@ class Command(BaseCommand):
     """Imports opportunities from a CSV file."""
     help = 'Imports opportunities from a CSV file'
 
+    # Fields written when an existing opportunity is updated in batch mode
+    batch_update_fields = [
+        'description',
+        'brand',
+        'business_unit',
+        'product',
+        'target',
+        'target_currency',
+        'fiscal_year',
+        'approved',
+        'approved_date',
+        'approval_user',
+        'status',
+        'modified',
+    ]
+
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Path to the CSV file containing opportunity data')
+        mode = parser.add_mutually_exclusive_group()
+        mode.add_argument(
+            '--batch',
+            action='store_true',
+            help='Preload the lookup tables and upsert the opportunities in bulk, one transaction per chunk'
+        )
+        mode.add_argument(
+            '--copy',
+            action='store_true',
+            help='Load the CSV into a staging table with PostgreSQL COPY and merge it in one statement'
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Number of rows per chunk in batch mode')
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Resume an interrupted batch import of the same file from its last committed chunk. Implies --batch'
+        )
+        add_validate_argument(parser)
+
+    def validate(self, rows, lookups):
+        """Yield an error for every value in a row that cannot be parsed or refers to something that does not exist."""
+        for line_number, row in rows:
+            # Check if we have a skip instruction
+            if row['Skip'] == 'True':
+                continue
+
+            try:
+                lookups.opportunities.add(int(row['ID']))
+            except ValueError:
+                yield line_number, f"Invalid ID '{row['ID']}'"
+
+            brand_name = row['Brand']
+            if brand_name not in lookups.brands:
+                yield line_number, f"Brand {brand_name} not found"
+
+            business_unit_name = row['Brand Business Unit']
+            if business_unit_name and (brand_name, business_unit_name) not in lookups.brand_business_units:
+                yield line_number, f"Brand Business Unit {business_unit_name} not found"
+
+            if row['Product'] not in lookups.products:
+                yield line_number, f"Product {row['Product']} not found"
+
+            try:
+                fiscal_year = int(row['Fiscal Year'])
+            except ValueError:
+                fiscal_year = None
+            if fiscal_year not in lookups.fiscal_years:
+                yield line_number, f"Fiscal Year {row['Fiscal Year']} not found"
+
+            approval_user_email = row['Approval User']
+            if approval_user_email and approval_user_email not in lookups.users:
+                yield line_number, f"Approval User {approval_user_email} not found"
+
+            try:
+                Decimal(row['Target Value'].replace(',', ''))
+            except InvalidOperation:
+                yield line_number, f"Invalid Target Value '{row['Target Value']}'"
 
     def handle(self, *args, **kwargs):
         csv_file_path = kwargs['csv_file']
 
+        if kwargs['validate']:
+            return validate_or_raise(self, csv_file_path)
+
+        if kwargs['copy'] and kwargs['resume']:
+            raise CommandError('--resume cannot be used with --copy')
+        if kwargs['batch'] or kwargs['resume']:
+            return self.handle_batch(csv_file_path, kwargs['chunk_size'], kwargs['resume'])
+        if kwargs['copy']:
+            return self.handle_copy(csv_file_path)
+
         try:
             self.stdout.write(self.style.SUCCESS(f'Importing opportunities from {csv_file_path}'))
             with open(csv_file_path, newline='', encoding='utf-8-sig') as csvfile:
@@ -40,7 +133,7 @@ class Command(BaseCommand):
                     approval_user = User.objects.get(email=approval_user_email) if approval_user_email else None
 
                     target_value = Decimal(row['Target Value'].replace(',', ''))
-                    approved = row['Approved']
+                    approved = parse_bool(row['Approved'])
 
                     opportunity, created = Opportunity.objects.update_or_create(
                         id=row['ID'],
@@ -86,3 +179,312 @@ class Command(BaseCommand):
             raise CommandError(f"Approval User {row['Approval User']} not found")
         except csv.Error as e:
             raise CommandError(f'CSV error: {e}')
+
+    def handle_batch(self, csv_file_path: str, chunk_size: int, resume: bool = False):
+        """Import the opportunities in bulk.
+
+        Every lookup table is read into a dictionary once, and the file is streamed in chunks, each of which is upserted
+        with a single statement inside its own transaction along with the import checkpoint. Model save() and signals
+        are bypassed, so the approval date is set here, and the ID sequence and brand portfolio snapshots are brought up
+        to date with each chunk.
+        """
+        self.stdout.write(self.style.SUCCESS(f'Importing opportunities in batches of {chunk_size} from {csv_file_path}'))
+
+        brands = dict(Brand.objects.values_list('name', 'id'))
+        business_units = {
+            (brand_id, name): business_unit_id
+            for brand_id, name, business_unit_id in BrandBusinessUnit.objects.values_list('brand_id', 'name', 'id')
+        }
+        products = dict(Product.objects.values_list('name', 'id'))
+        fiscal_years = dict(FiscalYear.objects.values_list('year', 'id'))
+        users = dict(User.objects.values_list('email', 'id'))
+
+        counts = {'created': 0, 'updated': 0, 'skipped': 0, 'rows': 0}
+
+        def import_chunk(chunk):
+            counts['rows'] += len(chunk)
+            # Keyed by ID so a repeated ID within a chunk is only written once, with its last row winning
+            opportunities = {}
+
+            for line_number, row in chunk:
+                # Check if we have a skip instruction
+                if row['Skip'] == 'True':
+                    counts['skipped'] += 1
+                    continue
+
+                brand_id = brands.get(row['Brand'])
+                if brand_id is None:
+                    raise CommandError(f"Line {line_number}: Brand {row['Brand']} not found")
+
+                business_unit_name = row['Brand Business Unit']
+                business_unit_id = business_units.get((brand_id, business_unit_name)) if business_unit_name else None
+                if business_unit_name and business_unit_id is None:
+                    raise CommandError(f"Line {line_number}: Brand Business Unit {business_unit_name} not found")
+
+                product_id = products.get(row['Product'])
+                if product_id is None:
+                    raise CommandError(f"Line {line_number}: Product {row['Product']} not found")
+
+                try:
+                    fiscal_year_id = fiscal_years.get(int(row['Fiscal Year']))
+                except ValueError:
+                    fiscal_year_id = None
+                if fiscal_year_id is None:
+                    raise CommandError(f"Line {line_number}: Fiscal Year {row['Fiscal Year']} not found")
+
+                approval_user_email = row['Approval User']
+                approval_user_id = users.get(approval_user_email) if approval_user_email else None
+                if approval_user_email and approval_user_id is None:
+                    raise CommandError(f"Line {line_number}: Approval User {approval_user_email} not found")
+
+                try:
+                    opportunity_id = int(row['ID'])
+                except ValueError:
+                    raise CommandError(f"Line {line_number}: Invalid ID '{row['ID']}'")
+
+                try:
+                    target = Decimal(row['Target Value'].replace(',', ''))
+                except InvalidOperation:
+                    raise CommandError(f"Line {line_number}: Invalid Target Value '{row['Target Value']}'")
+
+                opportunities[opportunity_id] = Opportunity(
+                    id=opportunity_id,
+                    description=row['Description'],
+                    brand_id=brand_id,
+                    business_unit_id=business_unit_id,
+                    product_id=product_id,
+                    target=target,
+                    fiscal_year_id=fiscal_year_id,
+                    approved=parse_bool(row['Approved']),
+                    approval_user_id=approval_user_id,
+                    status='active',
+                )
+
+            existing = {
+                opportunity_id: (brand_id, fiscal_year_id, approved_date)
+                for opportunity_id, brand_id, fiscal_year_id, approved_date in Opportunity.objects.filter(
+                    id__in=opportunities.keys()
+                ).values_list('id', 'brand_id', 'fiscal_year_id', 'approved_date')
+            }
+
+            brand_ids = set()
+            fiscal_year_ids = set()
+            moved_opportunity_ids = []
+            for opportunity in opportunities.values():
+                previous_brand_id, previous_fiscal_year_id, approved_date = existing.get(opportunity.id, (None,) * 3)
+                if opportunity.approved:
+                    opportunity.approved_date = approved_date or date.today()
+                brand_ids.update({opportunity.brand_id, previous_brand_id} - {None})
+                fiscal_year_ids.update({opportunity.fiscal_year_id, previous_fiscal_year_id} - {None})
+                if previous_brand_id not in (None, opportunity.brand_id):
+                    moved_opportunity_ids.append(opportunity.id)
+
+            Opportunity.objects.bulk_create(
+                list(opportunities.values()),
+                update_conflicts=True,
+                unique_fields=['id'],
+                update_fields=self.batch_update_fields,
+            )
+
+            # The IDs come from the CSV, so move the sequence past them. This is done with each chunk so that the
+            # sequence is right for the chunks that were committed, even if a later one fails.
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), [Opportunity]):
+                    cursor.execute(sql)
+
+            # The snapshots are not refreshed by signals in bulk, so refresh the fiscal years of the targets the chunk
+            # touched for its brands. An opportunity that moved brand also moves its revenue, which counts towards the
+            # fiscal year after it was earned. This is done with each chunk so that a resumed import does not need to
+            # know what the earlier chunks touched.
+            revenue_years = OpportunityPerformance.objects.filter(
+                opportunity_id__in=moved_opportunity_ids
+            ).annotate(next_year=F('fiscal_year__year') + 1).values('next_year')
+            for fiscal_year in FiscalYear.objects.filter(Q(pk__in=fiscal_year_ids) | Q(year__in=revenue_years)):
+                BrandPortfolioSnapshot.objects.refresh(fiscal_year, brand_ids=brand_ids)
+
+            counts['created'] += len(opportunities) - len(existing)
+            counts['updated'] += len(existing)
+
+        run = StreamingImport(self, csv_file_path, chunk_size=chunk_size, resume=resume).run(import_chunk)
+
+        # Write out summary
+        self.stdout.write(self.style.SUCCESS(f"Successfully created {counts['created']} opportunities and updated {counts['updated']} opportunities"))
+        self.stdout.write(self.style.SUCCESS(f"Total records created/updated: {counts['created'] + counts['updated']}"))
+        self.stdout.write(self.style.SUCCESS(f"Total records skipped: {counts['skipped']}"))
+        self.stdout.write(self.style.SUCCESS(f"Total rows in CSV: {run.row_count}"))
+
+    def handle_copy(self, csv_file_path: str):
+        """Import the opportunities through a PostgreSQL staging table.
+
+        The parsed rows are streamed into a temporary table with COPY, checked against the lookup tables in one query,
+        and merged into the opportunities with a single INSERT ... ON CONFLICT statement. Every invalid row is reported
+        with its line number, and nothing is written unless the whole file is valid.
+        """
+        started = perf_counter()
+        self.stdout.write(self.style.SUCCESS(f'Importing opportunities with COPY from {csv_file_path}'))
+
+        errors = []
+        counts = {'rows': 0, 'skipped': 0}
+        qn = connection.ops.quote_name
+        opportunity_table = qn(Opportunity._meta.db_table)
+        lookups = f"""
+            FROM opportunity_staging s
+            LEFT JOIN {qn(Brand._meta.db_table)} b ON b.name = s.brand
+            LEFT JOIN {qn(BrandBusinessUnit._meta.db_table)} bu ON bu.brand_id = b.id AND bu.name = s.business_unit
+            LEFT JOIN {qn(Product._meta.db_table)} p ON p.name = s.product
+            LEFT JOIN {qn(FiscalYear._meta.db_table)} fy ON fy.year = s.fiscal_year
+            LEFT JOIN {qn(User._meta.db_table)} u ON u.email = s.approval_user
+        """
+
+        def staged_rows(reader):
+            """Parse the rows into staging table values, recording any that cannot be parsed."""
+            for row in reader:
+                counts['rows'] += 1
+                line_number = reader.line_num
+
+                # Check if we have a skip instruction
+                if row['Skip'] == 'True':
+                    counts['skipped'] += 1
+                    continue
+
+                try:
+                    opportunity_id = int(row['ID'])
+                except ValueError:
+                    errors.append((line_number, f"Invalid ID '{row['ID']}'"))
+                    continue
+                try:
+                    fiscal_year = int(row['Fiscal Year'])
+                except ValueError:
+                    errors.append((line_number, f"Fiscal Year {row['Fiscal Year']} not found"))
+                    continue
+                try:
+                    target = Decimal(row['Target Value'].replace(',', ''))
+                except InvalidOperation:
+                    errors.append((line_number, f"Invalid Target Value '{row['Target Value']}'"))
+                    continue
+
+                yield (
+                    line_number,
+                    opportunity_id,
+                    row['Description'],
+                    row['Brand'],
+                    row['Brand Business Unit'] or None,
+                    row['Product'],
+                    fiscal_year,
+                    target,
+                    parse_bool(row['Approved']),
+                    row['Approval User'] or None,
+                )
+
+        try:
+            with open(csv_file_path, newline='', encoding='utf-8-sig') as csvfile, transaction.atomic():
+                with connection.cursor() as cursor:
+                    copy_to_staging_table(cursor, 'opportunity_staging', {
+                        'line_number': 'integer',
+                        'id': 'integer',
+                        'description': 'text',
+                        'brand': 'text',
+                        'business_unit': 'text',
+                        'product': 'text',
+                        'fiscal_year': 'integer',
+                        'target': 'numeric(14, 2)',
+                        'approved': 'boolean',
+                        'approval_user': 'text',
+                    }, staged_rows(csv.DictReader(csvfile)))
+
+                    cursor.execute(f"""
+                        SELECT s.line_number, s.brand, s.business_unit, s.product, s.fiscal_year, s.approval_user,
+                               b.id IS NULL, s.business_unit IS NOT NULL AND bu.id IS NULL, p.id IS NULL,
+                               fy.id IS NULL, s.approval_user IS NOT NULL AND u.id IS NULL
+                        {lookups}
+                        WHERE b.id IS NULL
+                           OR (s.business_unit IS NOT NULL AND bu.id IS NULL)
+                           OR p.id IS NULL
+                           OR fy.id IS NULL
+                           OR (s.approval_user IS NOT NULL AND u.id IS NULL)
+                    """)
+                    for (line_number, brand, business_unit, product, fiscal_year, approval_user,
+                         no_brand, no_business_unit, no_product, no_fiscal_year, no_approval_user) in cursor.fetchall():
+                        if no_brand:
+                            errors.append((line_number, f"Brand {brand} not found"))
+                        if no_business_unit:
+                            errors.append((line_number, f"Brand Business Unit {business_unit} not found"))
+                        if no_product:
+                            errors.append((line_number, f"Product {product} not found"))
+                        if no_fiscal_year:
+                            errors.append((line_number, f"Fiscal Year {fiscal_year} not found"))
+                        if no_approval_user:
+                            errors.append((line_number, f"Approval User {approval_user} not found"))
+
+                    if errors:
+                        for line_number, message in sorted(errors):
+                            self.stdout.write(self.style.ERROR(f"Line {line_number}: {message}"))
+                        raise CommandError(f"{len(errors)} invalid rows in {csv_file_path}, nothing was imported")
+
+                    # The brands the opportunities belonged to before the merge also need their snapshots refreshed
+                    cursor.execute(f"""
+                        SELECT DISTINCT o.brand_id FROM {opportunity_table} o JOIN opportunity_staging s ON s.id = o.id
+                    """)
+                    brand_ids = {brand_id for brand_id, in cursor.fetchall()}
+
+                    # A repeated ID is only merged once, with its last row winning
+                    cursor.execute(f"""
+                        WITH merged AS (
+                            INSERT INTO {opportunity_table} AS o (
+                                id, created, modified, status, status_changed, description, brand_id, business_unit_id,
+                                product_id, target, target_currency, fiscal_year_id, approved, approved_date,
+                                approval_user_id
+                            )
+                            SELECT DISTINCT ON (s.id)
+                                s.id, now(), now(), 'active', now(), s.description, b.id, bu.id, p.id, s.target, %s,
+                                fy.id, s.approved, CASE WHEN s.approved THEN CURRENT_DATE END, u.id
+                            {lookups}
+                            ORDER BY s.id, s.line_number DESC
+                            ON CONFLICT (id) DO UPDATE SET
+                                modified = EXCLUDED.modified,
+                                status = EXCLUDED.status,
+                                description = EXCLUDED.description,
+                                brand_id = EXCLUDED.brand_id,
+                                business_unit_id = EXCLUDED.business_unit_id,
+                                product_id = EXCLUDED.product_id,
+                                target = EXCLUDED.target,
+                                target_currency = EXCLUDED.target_currency,
+                                fiscal_year_id = EXCLUDED.fiscal_year_id,
+                                approved = EXCLUDED.approved,
+                                approved_date = CASE
+                                    WHEN EXCLUDED.approved THEN COALESCE(o.approved_date, CURRENT_DATE)
+                                END,
+                                approval_user_id = EXCLUDED.approval_user_id
+                            RETURNING xmax = 0 AS created, brand_id
+                        )
+                        SELECT COUNT(*) FILTER (WHERE created), COUNT(*) FILTER (WHERE NOT created),
+                               ARRAY_AGG(DISTINCT brand_id)
+                        FROM merged
+                    """, [str(Opportunity._meta.get_field('target').default_currency)])
+                    created_count, updated_count, merged_brand_ids = cursor.fetchone()
+                    brand_ids.update(merged_brand_ids or [])
+
+                    # The IDs come from the CSV, so move the sequence past them
+                    for sql in connection.ops.sequence_reset_sql(no_style(), [Opportunity]):
+                        cursor.execute(sql)
+
+                # The snapshots are not refreshed by signals in bulk, so refresh every year for the brands we touched,
+                # in the same transaction so they are never left stale
+                for fiscal_year in FiscalYear.objects.all():
+                    BrandPortfolioSnapshot.objects.refresh(fiscal_year, brand_ids=brand_ids)
+        except FileNotFoundError:
+            raise CommandError(f'File "{csv_file_path}" does not exist')
+        except csv.Error as e:
+            raise CommandError(f'CSV error: {e}')
+
+        elapsed = perf_counter() - started
+        row_count = counts['rows']
+
+        # Write out summary
+        self.stdout.write(self.style.SUCCESS(f"Successfully created {created_count} opportunities and updated {updated_count} opportunities"))
+        self.stdout.write(self.style.SUCCESS(f"Total records created/updated: {created_count + updated_count}"))
+        self.stdout.write(self.style.SUCCESS(f"Total records skipped: {counts['skipped']}"))
+        self.stdout.write(self.style.SUCCESS(f"Total rows in CSV: {row_count}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported in {elapsed:.1f}s ({row_count / elapsed if elapsed else 0:.0f} rows per second)"
+        ))
@@ -1,5 +1,6 @@
 """Imports business units from a CSV file"""
 from django.core.management.base import BaseCommand, CommandError
+from portfolio_planner.management.helpers.imports import add_validate_argument, validate_or_raise
 from portfolio_planner.models import OrgBusinessUnit
 from django.contrib.auth import get_user_model
 import csv
@@ -13,10 +14,23 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Path to the CSV file containing business unit data')
+        add_validate_argument(parser)
+
+    def validate(self, rows, lookups):
+        """Yield an error for every row with an unknown manager or a business unit name that already exists."""
+        for line_number, row in rows:
+            if row['Manager'] not in lookups.users:
+                yield line_number, f"Manager with email {row['Manager']} does not exist"
+            if row['Name'] in lookups.org_business_units:
+                yield line_number, f"Business unit '{row['Name']}' already exists"
+            lookups.org_business_units.add(row['Name'])
 
     def handle(self, *args, **kwargs):
         csv_file_path = kwargs['csv_file']
 
+        if kwargs['validate']:
+            return validate_or_raise(self, csv_file_path)
+
         try:
             self.stdout.write(self.style.SUCCESS(f'Importing business units from {csv_file_path}'))
             with open(csv_file_path, newline='', encoding='utf-8-sig') as csvfile:
@@ -1,72 +1,364 @@
 """Management command to import opportunity performance data from a CSV file"""
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from portfolio_planner.management.helpers.copy import copy_to_staging_table
+from portfolio_planner.management.helpers.imports import StreamingImport, read_chunks
+from portfolio_planner.management.helpers.imports import add_validate_argument, validate_or_raise
 from portfolio_planner.models import OpportunityPerformance, Opportunity, FiscalYear, PeriodPerformance
-from django.core.exceptions import ValidationError
+from portfolio_planner.models import BrandPortfolioSnapshot, OpportunityRevenueRollup
 import csv
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 
 
 class Command(BaseCommand):
+    """Imports opportunity performance data from a CSV file.
+
+    The whole file is validated before anything is written, then it is read and written in chunks in one transaction.
+    The performances in a chunk are created in bulk, and its period revenue is upserted on the unique (opportunity
+    performance, period) constraint. The brand portfolio snapshots are refreshed once, after the last chunk.
+
+    With `--chunked`, each chunk is instead committed along with an import checkpoint and its snapshots as soon as it is
+    written, so a large file can be resumed with `--resume` after a failure. The chunks before the failure stay
+    committed.
+    """
     help = 'Imports opportunity performance data from a CSV file'
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Path to the CSV file containing opportunity performance data')
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='Load the CSV into a staging table with PostgreSQL COPY and merge it with set-based statements'
+        )
+        parser.add_argument(
+            '--chunked',
+            action='store_true',
+            help='Commit each chunk along with an import checkpoint, rather than validating the whole file first'
+        )
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Number of rows written in each chunk')
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Resume an interrupted chunked import of the file from its last committed chunk. Implies --chunked'
+        )
+        add_validate_argument(parser)
+
+    def validate(self, rows, lookups):
+        """Yield an error for every row with an unknown fiscal year or revenue that cannot be parsed.
+
+        Rows for opportunities that do not exist are not errors, as they are skipped by the import.
+        """
+        for line_number, row in rows:
+            try:
+                fiscal_year = int(row['Fiscal year'])
+            except ValueError:
+                fiscal_year = None
+            if fiscal_year not in lookups.fiscal_years:
+                yield line_number, f"Fiscal Year {row['Fiscal year']} not found"
+
+            for period_num in range(1, 13):  # There are 12 periods in a fiscal year
+                revenue = row.get(f'Period {period_num}', '0').replace(',', '')
+                if revenue:
+                    try:
+                        Decimal(revenue)
+                    except InvalidOperation:
+                        yield line_number, f"Invalid revenue '{revenue}' for Period {period_num}"
 
     def handle(self, *args, **kwargs):
         csv_file_path = kwargs['csv_file']
 
-        try:
-            self.stdout.write(self.style.SUCCESS(f'Importing opportunity performance data from {csv_file_path}'))
-            with open(csv_file_path, newline='', encoding='utf-8-sig') as csvfile:
-                reader = csv.DictReader(csvfile)
-                created_count = 0
-                updated_count = 0
-                skipped_count = 0
+        if kwargs['validate']:
+            return validate_or_raise(self, csv_file_path)
+
+        if kwargs['copy']:
+            if kwargs['resume']:
+                raise CommandError('--resume cannot be used with --copy')
+            if kwargs['chunked']:
+                raise CommandError('--chunked cannot be used with --copy')
+            return self.handle_copy(csv_file_path)
+
+        self.stdout.write(self.style.SUCCESS(f'Importing opportunity performance data from {csv_file_path}'))
+        counts = {'created': 0, 'updated': 0, 'skipped': 0}
+        chunked = kwargs['chunked'] or kwargs['resume']
+        brand_ids_by_year = {}
+
+        def import_chunk(chunk):
+            performances, created_count, updated_count, skipped_count = self.parse(chunk)
+            performance_ids = self.write(performances)
+
+            # Bulk writes bypass the signals, so bring the denormalised revenue and snapshots up to date ourselves
+            OpportunityRevenueRollup.objects.refresh(OpportunityPerformance.objects.filter(pk__in=performance_ids))
+
+            # Each refresh reclassifies the whole fiscal year, so unless each chunk is committed it is only done once
+            chunk_brand_ids_by_year = self.snapshot_brand_ids(performances.keys())
+            if chunked:
+                self.refresh_snapshots(chunk_brand_ids_by_year)
+            else:
+                for year, brand_ids in chunk_brand_ids_by_year.items():
+                    brand_ids_by_year.setdefault(year, set()).update(brand_ids)
 
-                for row in reader:
-                    opportunity_id = row['Opportunity']
-                    fiscal_year_int = row['Fiscal year']
+            counts['created'] += created_count
+            counts['updated'] += updated_count
+            counts['skipped'] += skipped_count
 
+        if chunked:
+            StreamingImport(
+                self, csv_file_path, chunk_size=kwargs['chunk_size'], resume=kwargs['resume']
+            ).run(import_chunk)
+        else:
+            validate_or_raise(self, csv_file_path)
+            with transaction.atomic():
+                for chunk in read_chunks(csv_file_path, kwargs['chunk_size']):
+                    import_chunk(chunk)
+                self.refresh_snapshots(brand_ids_by_year)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Summary: Created {counts['created']}, Updated {counts['updated']}, Skipped {counts['skipped']}"
+        ))
+
+    def parse(self, rows):
+        """Parse and validate a chunk of rows.
+
+        Returns the period revenue keyed by (opportunity ID, fiscal year ID), and the created, updated and skipped
+        counts. A row is skipped when its opportunity does not exist.
+        """
+        fiscal_years = dict(FiscalYear.objects.values_list('year', 'id'))
+        opportunity_ids = set(Opportunity.objects.filter(
+            id__in={int(row['Opportunity']) for _, row in rows if row['Opportunity'].strip().isdigit()}
+        ).values_list('id', flat=True))
+        existing = set(OpportunityPerformance.objects.filter(
+            opportunity_id__in=opportunity_ids
+        ).values_list('opportunity_id', 'fiscal_year_id'))
+
+        performances = {}
+        created_count = 0
+        updated_count = 0
+        skipped_count = 0
+
+        for line_number, row in rows:
+            opportunity_id = row['Opportunity']
+
+            try:
+                fiscal_year_id = fiscal_years[int(row['Fiscal year'])]
+            except (KeyError, ValueError):
+                raise CommandError(f"Line {line_number}: Fiscal Year {row['Fiscal year']} not found")
+
+            if not opportunity_id.strip().isdigit() or int(opportunity_id) not in opportunity_ids:
+                skipped_count += 1
+                self.stdout.write(self.style.WARNING(f"Skipping: Opportunity with ID '{opportunity_id}' not found"))
+                continue
+
+            key = (int(opportunity_id), fiscal_year_id)
+            if key in performances or key in existing:
+                updated_count += 1
+            else:
+                created_count += 1
+            periods = performances.setdefault(key, {})
+
+            for period_num in range(1, 13):  # There are 12 periods in a fiscal year
+                revenue = row.get(f'Period {period_num}', '0').replace(',', '')
+                if revenue:
                     try:
-                        opportunity = Opportunity.objects.get(id=opportunity_id)
-                        fiscal_year = FiscalYear.objects.get(year=fiscal_year_int)
-
-                        # Create or update OpportunityPerformance
-                        opp_perf, created = OpportunityPerformance.objects.update_or_create(
-                            opportunity=opportunity,
-                            fiscal_year=fiscal_year
-                            # Add other fields and defaults if necessary
+                        periods[period_num] = Decimal(revenue)
+                    except InvalidOperation:
+                        raise CommandError(f"Line {line_number}: Invalid revenue '{revenue}' for Period {period_num}")
+
+        return performances, created_count, updated_count, skipped_count
+
+    def write(self, performances) -> list:
+        """Create the missing performances and upsert all the period revenue. Returns the performance IDs."""
+        performance_ids = {
+            (opportunity_id, fiscal_year_id): performance_id
+            for opportunity_id, fiscal_year_id, performance_id in OpportunityPerformance.objects.filter(
+                opportunity_id__in={opportunity_id for opportunity_id, _ in performances}
+            ).values_list('opportunity_id', 'fiscal_year_id', 'id')
+            if (opportunity_id, fiscal_year_id) in performances
+        }
+
+        created = OpportunityPerformance.objects.bulk_create([
+            OpportunityPerformance(opportunity_id=opportunity_id, fiscal_year_id=fiscal_year_id)
+            for opportunity_id, fiscal_year_id in performances.keys() - performance_ids.keys()
+        ], batch_size=5000)
+        performance_ids.update({
+            (performance.opportunity_id, performance.fiscal_year_id): performance.pk for performance in created
+        })
+
+        PeriodPerformance.objects.bulk_create(
+            [
+                PeriodPerformance(
+                    opportunity_performance_id=performance_ids[key],
+                    period=period,
+                    revenue=revenue,
+                    fiscal_year_id=key[1],
+                )
+                for key, periods in performances.items()
+                for period, revenue in periods.items()
+            ],
+            batch_size=5000,
+            update_conflicts=True,
+            unique_fields=['opportunity_performance', 'period'],
+            update_fields=['revenue', 'revenue_currency', 'fiscal_year'],
+        )
+
+        return list(performance_ids.values())
+
+    def snapshot_brand_ids(self, keys) -> dict:
+        """Get the IDs of the brands whose portfolio snapshots depend on the imported revenue, keyed by fiscal year.
+
+        Revenue earned in a fiscal year counts towards the snapshots of the following fiscal year.
+        """
+        years = dict(FiscalYear.objects.values_list('id', 'year'))
+        brands = dict(Opportunity.objects.filter(
+            id__in={opportunity_id for opportunity_id, _ in keys}
+        ).values_list('id', 'brand_id'))
+
+        brand_ids_by_year = {}
+        for opportunity_id, fiscal_year_id in keys:
+            brand_ids_by_year.setdefault(years[fiscal_year_id] + 1, set()).add(brands[opportunity_id])
+
+        return brand_ids_by_year
+
+    def refresh_snapshots(self, brand_ids_by_year: dict):
+        """Refresh the brand portfolio snapshots of the given brands, keyed by fiscal year."""
+        for fiscal_year in FiscalYear.objects.filter(year__in=brand_ids_by_year.keys()):
+            BrandPortfolioSnapshot.objects.refresh(fiscal_year, brand_ids=brand_ids_by_year[fiscal_year.year])
+
+    def handle_copy(self, csv_file_path: str):
+        """Import the performance history through a PostgreSQL staging table.
+
+        Each period of each row is streamed into a temporary table with COPY. Rows for unknown opportunities are skipped
+        and rows for unknown fiscal years are reported by line number, both in one query. The missing performances are
+        then inserted, and all the periods merged with a single INSERT ... ON CONFLICT statement.
+        """
+        self.stdout.write(self.style.SUCCESS(f'Importing opportunity performance data with COPY from {csv_file_path}'))
+
+        errors = []
+        qn = connection.ops.quote_name
+        performance_table = qn(OpportunityPerformance._meta.db_table)
+        lookups = f"""
+            FROM performance_staging s
+            LEFT JOIN {qn(Opportunity._meta.db_table)} o ON o.id = s.opportunity_id
+            LEFT JOIN {qn(FiscalYear._meta.db_table)} fy ON fy.year = s.fiscal_year
+        """
+
+        def staged_rows(reader):
+            """Parse each row into one staging table row per period, recording any that cannot be parsed."""
+            for row in reader:
+                line_number = reader.line_num
+                opportunity_id = row['Opportunity'].strip()
+
+                try:
+                    fiscal_year = int(row['Fiscal year'])
+                except ValueError:
+                    errors.append((line_number, f"Fiscal Year {row['Fiscal year']} not found"))
+                    continue
+
+                # The period is NULL when the row has no revenue, so it still takes part in the row checks
+                periods = []
+                for period_num in range(1, 13):  # There are 12 periods in a fiscal year
+                    revenue = row.get(f'Period {period_num}', '0').replace(',', '')
+                    if revenue:
+                        try:
+                            periods.append((period_num, Decimal(revenue)))
+                        except InvalidOperation:
+                            errors.append((line_number, f"Invalid revenue '{revenue}' for Period {period_num}"))
+
+                for period_num, revenue in periods or [(None, None)]:
+                    yield (
+                        line_number,
+                        opportunity_id if opportunity_id.isdigit() else None,
+                        row['Opportunity'],
+                        fiscal_year,
+                        period_num,
+                        revenue,
+                    )
+
+        try:
+            with open(csv_file_path, newline='', encoding='utf-8-sig') as csvfile, transaction.atomic():
+                with connection.cursor() as cursor:
+                    copy_to_staging_table(cursor, 'performance_staging', {
+                        'line_number': 'integer',
+                        'opportunity_id': 'integer',
+                        'opportunity': 'text',
+                        'fiscal_year': 'integer',
+                        'period': 'integer',
+                        'revenue': 'numeric(14, 2)',
+                    }, staged_rows(csv.DictReader(csvfile)))
+
+                    cursor.execute(f"""
+                        SELECT DISTINCT s.line_number, s.opportunity, s.fiscal_year, o.id IS NULL, fy.id IS NULL
+                        {lookups}
+                        WHERE o.id IS NULL OR fy.id IS NULL
+                        ORDER BY s.line_number
+                    """)
+                    skipped_lines = set()
+                    for line_number, opportunity, fiscal_year, no_opportunity, no_fiscal_year in cursor.fetchall():
+                        if no_fiscal_year:
+                            errors.append((line_number, f"Fiscal Year {fiscal_year} not found"))
+                        elif no_opportunity:
+                            skipped_lines.add(line_number)
+                            self.stdout.write(self.style.WARNING(
+                                f"Line {line_number}: Skipping: Opportunity with ID '{opportunity}' not found"
+                            ))
+
+                    if errors:
+                        for line_number, message in sorted(errors):
+                            self.stdout.write(self.style.ERROR(f"Line {line_number}: {message}"))
+                        raise CommandError(f"{len(errors)} invalid rows in {csv_file_path}, nothing was imported")
+
+                    # Each valid row either creates its performance, if it is the first row for a new one, or updates it
+                    cursor.execute(f"""
+                        SELECT COUNT(DISTINCT s.line_number)
+                        {lookups}
+                        WHERE o.id IS NOT NULL AND fy.id IS NOT NULL
+                    """)
+                    row_count = cursor.fetchone()[0]
+
+                    cursor.execute(f"""
+                        INSERT INTO {performance_table} (opportunity_id, fiscal_year_id)
+                        SELECT DISTINCT o.id, fy.id
+                        {lookups}
+                        WHERE o.id IS NOT NULL AND fy.id IS NOT NULL
+                        ON CONFLICT (opportunity_id, fiscal_year_id) DO NOTHING
+                    """)
+                    created_count = cursor.rowcount
+                    updated_count = row_count - created_count
+
+                    # A repeated period is only merged once, with its last row winning
+                    cursor.execute(f"""
+                        INSERT INTO {qn(PeriodPerformance._meta.db_table)} AS pp (
+                            opportunity_performance_id, period, revenue, revenue_currency, fiscal_year_id
                         )
+                        SELECT DISTINCT ON (op.id, s.period) op.id, s.period, s.revenue, %s, fy.id
+                        {lookups}
+                        JOIN {performance_table} op ON op.opportunity_id = o.id AND op.fiscal_year_id = fy.id
+                        WHERE s.period IS NOT NULL
+                        ORDER BY op.id, s.period, s.line_number DESC
+                        ON CONFLICT (opportunity_performance_id, period) DO UPDATE SET
+                            revenue = EXCLUDED.revenue,
+                            revenue_currency = EXCLUDED.revenue_currency,
+                            fiscal_year_id = EXCLUDED.fiscal_year_id
+                    """, [str(PeriodPerformance._meta.get_field('revenue').default_currency)])
 
-                        for period_num in range(1, 13):  # There are 12 periods in a fiscal year
-                            revenue = row.get(f'Period {period_num}', '0').replace(',', '')
-                            if revenue:
-                                revenue = Decimal(revenue)
-                                PeriodPerformance.objects.update_or_create(
-                                    opportunity_performance=opp_perf,
-                                    period=period_num,
-                                    fiscal_year=fiscal_year,
-                                    defaults={'revenue': revenue}
-                                )
-
-                        action = "created" if created else "updated"
-                        if action == "created":
-                            created_count += 1
-                        else:
-                            updated_count += 1
-
-                        self.stdout.write(self.style.SUCCESS(f"Successfully {action} opportunity performance with Opportunity ID '{opportunity_id}'"))
-
-                    except Opportunity.DoesNotExist:
-                        skipped_count += 1
-                        self.stdout.write(self.style.WARNING(f"Skipping: Opportunity with ID '{opportunity_id}' not found"))
-
-                self.stdout.write(self.style.SUCCESS(f"Summary: Created {created_count}, Updated {updated_count}, Skipped {skipped_count}"))
+                    cursor.execute(f"""
+                        SELECT DISTINCT op.id, op.opportunity_id, op.fiscal_year_id
+                        {lookups}
+                        JOIN {performance_table} op ON op.opportunity_id = o.id AND op.fiscal_year_id = fy.id
+                    """)
+                    performances = {
+                        (opportunity_id, fiscal_year_id): pk for pk, opportunity_id, fiscal_year_id in cursor.fetchall()
+                    }
+
+                # Bulk writes bypass the signals, so bring the denormalised revenue and snapshots up to date ourselves
+                OpportunityRevenueRollup.objects.refresh(
+                    OpportunityPerformance.objects.filter(pk__in=performances.values())
+                )
+                self.refresh_snapshots(self.snapshot_brand_ids(performances.keys()))
         except FileNotFoundError:
             raise CommandError(f'File "{csv_file_path}" does not exist')
-        except FiscalYear.DoesNotExist:
-            raise CommandError(f"Fiscal Year {row['Fiscal year']} not found")
-        except ValidationError as e:
-            raise CommandError(f'Validation error: {e}')
         except csv.Error as e:
             raise CommandError(f'CSV error: {e}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Summary: Created {created_count}, Updated {updated_count}, Skipped {len(skipped_lines)}"
+        ))
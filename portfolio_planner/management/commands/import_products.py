@@ -1,5 +1,6 @@
 """Management command to import products from a CSV file."""
 from django.core.management.base import BaseCommand, CommandError
+from portfolio_planner.management.helpers.imports import add_validate_argument, validate_or_raise
 from portfolio_planner.models import Product
 import csv
 
@@ -10,10 +11,21 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Path to the CSV file containing product data')
+        add_validate_argument(parser)
+
+    def validate(self, rows, lookups):
+        """Yield an error for every row with a product name that already exists."""
+        for line_number, row in rows:
+            if row['Name'] in lookups.products:
+                yield line_number, f"Product '{row['Name']}' already exists"
+            lookups.products.add(row['Name'])
 
     def handle(self, *args, **kwargs):
         csv_file_path = kwargs['csv_file']
 
+        if kwargs['validate']:
+            return validate_or_raise(self, csv_file_path)
+
         try:
             self.stdout.write(self.style.SUCCESS(f'Importing media groups from {csv_file_path}'))
             with open(csv_file_path, newline='') as csvfile:
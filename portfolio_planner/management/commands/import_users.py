@@ -2,6 +2,7 @@
 from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import Group
 from django.db import IntegrityError, transaction
+from portfolio_planner.management.helpers.imports import add_validate_argument, validate_or_raise
 from portfolio_planner.models import User
 import csv
 
@@ -11,11 +12,24 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Path to the CSV file containing user data')
+        add_validate_argument(parser)
+
+    def validate(self, rows, lookups):
+        """Yield an error for every row without an email address or with a role that has no group."""
+        for line_number, row in rows:
+            if not row['Email Address']:
+                yield line_number, 'Email Address is missing'
+            if row['Role'] not in lookups.groups:
+                yield line_number, f"Group {row['Role']} does not exist"
+            lookups.users.add(row['Email Address'])
 
     @transaction.atomic
     def handle(self, *args, **kwargs):
         csv_file_path = kwargs['csv_file']
 
+        if kwargs['validate']:
+            return validate_or_raise(self, csv_file_path)
+
         try:
             self.stdout.write(self.style.SUCCESS(f'Importing users from {csv_file_path}'))
             with open(csv_file_path, newline='') as csvfile:
@@ -22,4 +22,9 @@ class Command(BaseCommand):
             print(f'Loading test data from {fixture_file}')  # noqa: T201
             call_command('loaddata', fixture_file)
 
+        # Fixtures are loaded raw, so the denormalised revenue and dashboard data must be built afterwards
+        print('Building revenue rollups and brand portfolio snapshots')  # noqa: T201
+        call_command('rebuild_revenue_rollups')
+        call_command('rebuild_brand_snapshots')
+
 
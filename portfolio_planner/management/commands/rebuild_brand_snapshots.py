@@ -0,0 +1,27 @@
+"""Management command to rebuild the brand portfolio snapshots."""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from portfolio_planner.models import BrandPortfolioSnapshot, FiscalYear
+
+
+class Command(BaseCommand):
+    """Rebuilds the brand portfolio snapshots from scratch."""
+    help = 'Rebuilds the brand portfolio snapshots from the opportunities and performance history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fiscal-year', type=int, help='Only rebuild the snapshots for this fiscal year')
+
+    def handle(self, *args, **kwargs):
+        fiscal_years = FiscalYear.objects.order_by('year')
+        if kwargs['fiscal_year']:
+            fiscal_years = fiscal_years.filter(year=kwargs['fiscal_year'])
+            if not fiscal_years.exists():
+                raise CommandError(f"Fiscal Year {kwargs['fiscal_year']} not found")
+
+        for fiscal_year in fiscal_years:
+            with transaction.atomic():
+                BrandPortfolioSnapshot.objects.filter(fiscal_year=fiscal_year).delete()
+                BrandPortfolioSnapshot.objects.refresh(fiscal_year)
+
+            count = BrandPortfolioSnapshot.objects.filter(fiscal_year=fiscal_year).count()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} brand portfolio snapshots for fiscal year {fiscal_year}"))
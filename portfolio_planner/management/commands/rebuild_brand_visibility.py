@@ -0,0 +1,18 @@
+"""Management command to rebuild the brand visibility."""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from portfolio_planner.models import BrandVisibility, User
+from portfolio_planner.scopes import invalidate_role_scopes
+
+
+class Command(BaseCommand):
+    """Rebuilds the brand visibility from scratch."""
+    help = 'Rebuilds which brands each user can see from their roles, brands and business units'
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            BrandVisibility.objects.all().delete()
+            count = BrandVisibility.objects.refresh(User.objects.all())
+
+        invalidate_role_scopes()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} brand visibility rows"))
@@ -0,0 +1,71 @@
+"""Management command to verify or rebuild the opportunity revenue rollups."""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from portfolio_planner.models import OpportunityPerformance, OpportunityRevenueRollup
+
+
+class Command(BaseCommand):
+    """Verifies or rebuilds the opportunity revenue rollups from the performance periods."""
+    help = 'Verifies or rebuilds the opportunity revenue rollups from the performance periods'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only check the rollups against the performance periods and report any differences'
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs['verify']:
+            self.verify()
+        else:
+            self.rebuild()
+
+    def rebuild(self):
+        with transaction.atomic():
+            OpportunityRevenueRollup.objects.all().delete()
+            count = OpportunityRevenueRollup.objects.refresh(OpportunityPerformance.objects.all())
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} opportunity revenue rollups"))
+
+    def verify(self):
+        """Compare the stored rollups with a fresh rollup of the performance periods, without writing anything."""
+        stored = {
+            (rollup.opportunity_id, rollup.fiscal_year_id): rollup
+            for rollup in OpportunityRevenueRollup.objects.all().iterator()
+        }
+
+        expected = {
+            (rollup.opportunity_id, rollup.fiscal_year_id): rollup
+            for rollup in OpportunityRevenueRollup.objects.calculate(OpportunityPerformance.objects.all())
+        }
+
+        missing = expected.keys() - stored.keys()
+        orphaned = stored.keys() - expected.keys()
+        stale = [
+            key for key in expected.keys() & stored.keys()
+            if any(
+                getattr(expected[key], field) != getattr(stored[key], field)
+                for field in OpportunityRevenueRollup.REVENUE_FIELDS
+            )
+        ]
+
+        for opportunity_id, fiscal_year_id in sorted(missing):
+            self.stdout.write(self.style.WARNING(
+                f"Missing rollup for Opportunity ID '{opportunity_id}' in fiscal year ID '{fiscal_year_id}'"
+            ))
+        for opportunity_id, fiscal_year_id in sorted(orphaned):
+            self.stdout.write(self.style.WARNING(
+                f"Orphaned rollup for Opportunity ID '{opportunity_id}' in fiscal year ID '{fiscal_year_id}'"
+            ))
+        for opportunity_id, fiscal_year_id in sorted(stale):
+            self.stdout.write(self.style.WARNING(
+                f"Stale rollup for Opportunity ID '{opportunity_id}' in fiscal year ID '{fiscal_year_id}'"
+            ))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Summary: Checked {len(expected)}, Missing {len(missing)}, Orphaned {len(orphaned)}, Stale {len(stale)}"
+        ))
+
+        if missing or orphaned or stale:
+            raise CommandError('Opportunity revenue rollups are out of date. Run without --verify to rebuild them.')
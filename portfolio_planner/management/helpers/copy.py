@@ -0,0 +1,85 @@
+"""Helpers for loading CSV imports into PostgreSQL staging tables with COPY."""
+import csv
+from io import StringIO
+
+from django.core.management.base import CommandError
+from django.db import connection
+
+from portfolio_planner.management.helpers.imports import chunked
+
+
+class CopyStream:
+    """A read-only file-like object that encodes rows as CSV on demand.
+
+    psycopg2 reads the COPY data from a file in blocks, so the rows are only encoded as each block is requested and the
+    whole file never has to be held in memory.
+    """
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.buffer = StringIO()
+        self.writer = csv.writer(self.buffer, lineterminator='\n')
+        self.pending = ''
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self.pending) < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+
+            self.buffer.seek(0)
+            self.buffer.truncate()
+            self.writer.writerow(row)
+            self.pending += self.buffer.getvalue()
+
+        if size < 0:
+            size = len(self.pending)
+
+        data, self.pending = self.pending[:size], self.pending[size:]
+        return data
+
+    readline = read
+
+
+def copy_to_staging_table(cursor, table: str, columns: dict, rows) -> int:
+    """Create a temporary staging table and stream the rows into it with COPY.
+
+    `columns` maps each column name to its PostgreSQL type, in the order the values appear in each row. None values are
+    loaded as NULL. The table is dropped when the transaction commits, so this must be called inside `atomic()`.
+    Returns the number of rows loaded.
+    """
+    if connection.vendor != 'postgresql':
+        raise CommandError('--copy is only supported on PostgreSQL')
+
+    column_definitions = ', '.join(f'{name} {column_type}' for name, column_type in columns.items())
+    cursor.execute(f'CREATE TEMPORARY TABLE {table} ({column_definitions}) ON COMMIT DROP')
+
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+        CopyStream(rows),
+        size=64 * 1024,
+    )
+    cursor.execute(f'ANALYZE {table}')
+    cursor.execute(f'SELECT COUNT(*) FROM {table}')
+    return cursor.fetchone()[0]
+
+
+def insert_rows(model, fields: list, rows, batch_size: int = 5000):
+    """Insert rows straight into a model's table, with COPY on PostgreSQL and in bulk everywhere else.
+
+    `fields` are the field names (or attnames, such as `brand_id`) of the values in each row. Fields that are left out
+    get their database default, which for an auto primary key is the next value of its sequence. No signals are sent and
+    no validation is done.
+    """
+    if connection.vendor != 'postgresql':
+        for chunk in chunked(rows, batch_size):
+            model.objects.bulk_create([model(**dict(zip(fields, row))) for row in chunk])
+        return
+
+    columns = ', '.join(model._meta.get_field(name).column for name in fields)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {model._meta.db_table} ({columns}) FROM STDIN WITH (FORMAT csv)',
+            CopyStream(rows),
+            size=64 * 1024,
+        )
@@ -0,0 +1,280 @@
+"""Helpers shared by the CSV import management commands."""
+import csv
+import hashlib
+from itertools import islice
+from time import perf_counter
+
+from django.contrib.auth.models import Group
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from portfolio_planner.models import Agency
+from portfolio_planner.models import Brand
+from portfolio_planner.models import BrandBusinessUnit
+from portfolio_planner.models import FiscalYear
+from portfolio_planner.models import ImportRun
+from portfolio_planner.models import MediaGroup
+from portfolio_planner.models import Opportunity
+from portfolio_planner.models import OrgBusinessUnit
+from portfolio_planner.models import Product
+from portfolio_planner.models import User
+
+
+def chunked(rows, size: int):
+    """Yield lists of up to `size` rows from an iterable, without reading it all into memory."""
+    iterator = iter(rows)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def parse_bool(value: str) -> bool:
+    """Parse a boolean CSV value such as True, False, 1 or 0.
+
+    Every import mode parses its boolean columns with this, so a file imports the same whichever mode it is run in.
+    """
+    return str(value).strip().lower() in ('true', 't', 'yes', 'y', '1')
+
+
+def file_hash(path: str) -> str:
+    """Get the SHA-256 hash of a file, reading it in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while block := file.read(1024 * 1024):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_chunks(csv_file_path: str, chunk_size: int):
+    """Yield lists of up to `chunk_size` (line number, row) pairs from a CSV file, without reading it all at once."""
+    try:
+        with open(csv_file_path, newline='', encoding='utf-8-sig') as csvfile:
+            reader = csv.DictReader(csvfile)
+            yield from chunked(((reader.line_num, row) for row in reader), chunk_size)
+    except FileNotFoundError:
+        raise CommandError(f'File "{csv_file_path}" does not exist')
+    except csv.Error as e:
+        raise CommandError(f'CSV error: {e}')
+
+
+class StreamingImport:
+    """Streams a CSV file through an import in chunks, committing a checkpoint with each chunk.
+
+    Each chunk is processed in its own transaction along with an update to the `ImportRun` for the file, so the
+    checkpoint always matches what has been committed. With `resume`, the rows up to the last committed line of the
+    latest run for the same file are skipped. The file is matched by its path or the hash of its contents, so a file can
+    be fixed after a failed chunk and the import resumed, as long as the lines that were already committed are left
+    alone.
+    """
+
+    def __init__(self, command, csv_file_path: str, chunk_size: int = 1000, resume: bool = False,
+                 progress_interval: float = 5.0):
+        self.command = command
+        self.csv_file_path = csv_file_path
+        self.chunk_size = chunk_size
+        self.resume = resume
+        self.progress_interval = progress_interval
+
+    def get_run(self, command_name: str, hash_value: str):
+        """Get the import run to continue, or start a new one."""
+        if self.resume:
+            run = ImportRun.objects.filter(
+                Q(file_name=self.csv_file_path) | Q(file_hash=hash_value),
+                command=command_name,
+            ).order_by('-created').first()
+            if run is not None and run.status == ImportRun.STATUS.completed and run.file_hash == hash_value:
+                return run
+            if run is not None and run.status != ImportRun.STATUS.completed:
+                if run.file_hash != hash_value:
+                    self.command.stdout.write(self.command.style.WARNING(
+                        f'{self.csv_file_path} has changed since import run {run.pk}, the lines up to {run.last_line} '
+                        f'are assumed to be the ones already committed'
+                    ))
+                self.command.stdout.write(self.command.style.WARNING(
+                    f'Resuming import run {run.pk} after line {run.last_line} ({run.row_count} rows already committed)'
+                ))
+                run.file_name = self.csv_file_path
+                run.file_hash = hash_value
+                run.status = ImportRun.STATUS.running
+                run.save(update_fields=['file_name', 'file_hash', 'status', 'status_changed', 'modified'])
+                return run
+
+            self.command.stdout.write(
+                self.command.style.WARNING('No import run to resume, starting from the beginning')
+            )
+
+        return ImportRun.objects.create(command=command_name, file_name=self.csv_file_path, file_hash=hash_value)
+
+    def run(self, process_chunk) -> ImportRun:
+        """Run `process_chunk` on each chunk of (line number, row) pairs not yet committed.
+
+        Returns the import run, which is marked as failed if the import raises.
+        """
+        command_name = self.command.__module__.rsplit('.', 1)[-1]
+
+        try:
+            hash_value = file_hash(self.csv_file_path)
+        except FileNotFoundError:
+            raise CommandError(f'File "{self.csv_file_path}" does not exist')
+
+        run = self.get_run(command_name, hash_value)
+        if run.status == ImportRun.STATUS.completed:
+            self.command.stdout.write(self.command.style.WARNING(
+                f'{self.csv_file_path} was already imported completely by import run {run.pk}'
+            ))
+            return run
+
+        started = perf_counter()
+        reported = started
+        committed = 0
+
+        try:
+            with open(self.csv_file_path, newline='', encoding='utf-8-sig') as csvfile:
+                reader = csv.DictReader(csvfile)
+                numbered_rows = (
+                    (reader.line_num, row) for row in reader if reader.line_num > run.last_line
+                )
+
+                for chunk in chunked(numbered_rows, self.chunk_size):
+                    with transaction.atomic():
+                        process_chunk(chunk)
+                        run.last_line = chunk[-1][0]
+                        run.row_count += len(chunk)
+                        run.save(update_fields=['last_line', 'row_count', 'modified'])
+                    committed += len(chunk)
+
+                    now = perf_counter()
+                    if now - reported >= self.progress_interval:
+                        reported = now
+                        self.command.stdout.write(
+                            f'Committed {committed} rows up to line {run.last_line} '
+                            f'({committed / (now - started):.0f} rows per second)'
+                        )
+        except csv.Error as e:
+            self.fail(run)
+            raise CommandError(f'CSV error: {e}')
+        except BaseException:
+            self.fail(run)
+            raise
+
+        run.status = ImportRun.STATUS.completed
+        run.save(update_fields=['status', 'status_changed', 'modified'])
+
+        elapsed = perf_counter() - started
+        self.command.stdout.write(self.command.style.SUCCESS(
+            f'Committed {committed} rows in {elapsed:.1f}s '
+            f'({committed / elapsed if elapsed else 0:.0f} rows per second)'
+        ))
+        return run
+
+    def fail(self, run: ImportRun):
+        """Mark the run as failed, keeping the checkpoint of the last committed chunk."""
+        run.status = ImportRun.STATUS.failed
+        run.save(update_fields=['status', 'status_changed', 'modified'])
+        self.command.stdout.write(self.command.style.ERROR(
+            f'Import run {run.pk} failed with the lines up to {run.last_line} committed. '
+            f'Fix the lines after it and run again with --resume'
+        ))
+
+
+def add_validate_argument(parser):
+    """Add the --validate / --dry-run option shared by the import commands."""
+    parser.add_argument(
+        '--validate',
+        '--dry-run',
+        dest='validate',
+        action='store_true',
+        help='Check the whole file and report every error with its line number, without writing anything'
+    )
+
+
+class ImportLookups:
+    """The natural keys of the rows already in the database, used to validate imports without a query per row.
+
+    Each table is loaded with a single query the first time it is needed. When a whole directory is validated, each
+    command adds the keys from its file, so that later files can refer to rows that earlier files would create.
+    """
+
+    @cached_property
+    def users(self) -> set:
+        return set(User.objects.values_list('email', flat=True))
+
+    @cached_property
+    def groups(self) -> set:
+        return set(Group.objects.values_list('name', flat=True))
+
+    @cached_property
+    def org_business_units(self) -> set:
+        return set(OrgBusinessUnit.objects.values_list('name', flat=True))
+
+    @cached_property
+    def media_groups(self) -> set:
+        return set(MediaGroup.objects.values_list('name', flat=True))
+
+    @cached_property
+    def products(self) -> set:
+        return set(Product.objects.values_list('name', flat=True))
+
+    @cached_property
+    def agencies(self) -> set:
+        return set(Agency.objects.values_list('name', flat=True))
+
+    @cached_property
+    def brands(self) -> set:
+        return set(Brand.objects.values_list('name', flat=True))
+
+    @cached_property
+    def brand_business_units(self) -> set:
+        """(brand name, business unit name) pairs."""
+        return set(BrandBusinessUnit.objects.values_list('brand__name', 'name'))
+
+    @cached_property
+    def fiscal_years(self) -> set:
+        return set(FiscalYear.objects.values_list('year', flat=True))
+
+    @cached_property
+    def opportunities(self) -> set:
+        return set(Opportunity.objects.values_list('id', flat=True))
+
+
+def validate_file(command, csv_file_path: str, lookups: ImportLookups = None) -> bool:
+    """Validate a CSV file with the command's `validate` method, without writing anything.
+
+    `validate` is given the (line number, row) pairs and the lookups, and yields a (line number, message) pair for each
+    error. Every error is reported, and the return value says whether the file is valid.
+    """
+    lookups = lookups or ImportLookups()
+    started = perf_counter()
+    row_count = 0
+
+    def numbered_rows(reader):
+        nonlocal row_count
+        for row in reader:
+            row_count += 1
+            yield reader.line_num, row
+
+    command.stdout.write(command.style.SUCCESS(f'Validating {csv_file_path}'))
+    try:
+        with open(csv_file_path, newline='', encoding='utf-8-sig') as csvfile:
+            errors = list(command.validate(numbered_rows(csv.DictReader(csvfile)), lookups))
+    except FileNotFoundError:
+        raise CommandError(f'File "{csv_file_path}" does not exist')
+    except KeyError as e:
+        raise CommandError(f'Column {e} is missing from {csv_file_path}')
+    except csv.Error as e:
+        raise CommandError(f'CSV error: {e}')
+
+    for line_number, message in errors:
+        command.stdout.write(command.style.ERROR(f'Line {line_number}: {message}'))
+
+    elapsed = perf_counter() - started
+    summary = f'Validated {row_count} rows in {elapsed:.1f}s, {len(errors)} errors'
+    command.stdout.write(command.style.ERROR(summary) if errors else command.style.SUCCESS(summary))
+    return not errors
+
+
+def validate_or_raise(command, csv_file_path: str):
+    """Validate a CSV file, raising CommandError if it has any errors."""
+    if not validate_file(command, csv_file_path):
+        raise CommandError(f'{csv_file_path} is not valid, nothing was imported')
@@ -0,0 +1,19 @@
+"""PortfolioPlanner middleware."""
+from django.utils.functional import SimpleLazyObject
+
+from portfolio_planner.scopes import get_role_scope
+
+
+class RoleScopeMiddleware:
+    """Make the role scope of the user available as `request.role_scope`.
+
+    The scope is only resolved when a view first uses it, and then only once per request. Must come after
+    AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.role_scope = SimpleLazyObject(lambda: get_role_scope(request.user))
+        return self.get_response(request)
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:12
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio_planner', '0005_alter_agency_name_alter_brand_name_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BrandPortfolioSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('total_target', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Sum of the target for the brand opportunities in the fiscal year', max_digits=14)),
+                ('total_revenue_last_fiscal', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Revenue in the previous fiscal year for the brand active and won opportunities', max_digits=14)),
+                ('grow_bucket', models.CharField(choices=[('Game Changer', 'Game Changer'), ('Real Opportunity', 'Real Opportunity'), ('Open', 'Open'), ('Wish', 'Wish')], default='Wish', help_text='G.R.O.W. bucket of the brand. One of Game Changer, Real Opportunity, Open or Wish', max_length=32)),
+                ('brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='portfolio_snapshots', to='portfolio_planner.brand')),
+                ('fiscal_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='portfolio_planner.fiscalyear')),
+            ],
+            options={
+                'unique_together': {('brand', 'fiscal_year')},
+            },
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:41
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+QUARTER_PERIODS = {
+    1: [1, 2, 3],
+    2: [4, 5, 6],
+    3: [7, 8, 9],
+    4: [10, 11, 12],
+}
+
+
+def build_revenue_rollups(apps, schema_editor):
+    """Build the rollups for the existing performance history."""
+    OpportunityPerformance = apps.get_model('portfolio_planner', 'OpportunityPerformance')
+    OpportunityRevenueRollup = apps.get_model('portfolio_planner', 'OpportunityRevenueRollup')
+
+    decimal_field = DecimalField(max_digits=14, decimal_places=2)
+    zero_value = Value(Decimal('0.00'), output_field=decimal_field)
+    period_revenue = {
+        f'period_{period}_revenue': Coalesce(
+            Sum('periods__revenue', filter=Q(periods__period=period), output_field=decimal_field),
+            zero_value
+        )
+        for period in range(1, 13)
+    }
+
+    rollups = []
+    for row in OpportunityPerformance.objects.order_by().values('opportunity_id', 'fiscal_year_id').annotate(**period_revenue):
+        for quarter, periods in QUARTER_PERIODS.items():
+            row[f'q{quarter}_revenue'] = sum(row[f'period_{period}_revenue'] for period in periods)
+        row['total_revenue'] = sum(row[f'period_{period}_revenue'] for period in range(1, 13))
+        rollups.append(OpportunityRevenueRollup(**row))
+
+    OpportunityRevenueRollup.objects.bulk_create(rollups, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio_planner', '0006_brandportfoliosnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpportunityRevenueRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_1_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('period_2_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('period_3_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('period_4_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('period_5_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('period_6_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('period_7_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('period_8_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('period_9_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('period_10_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('period_11_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('period_12_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('q1_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('q2_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('q3_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('q4_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('fiscal_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='portfolio_planner.fiscalyear')),
+                ('opportunity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revenue_rollups', to='portfolio_planner.opportunity')),
+            ],
+            options={
+                'unique_together': {('opportunity', 'fiscal_year')},
+            },
+        ),
+        migrations.RunPython(build_revenue_rollups, migrations.RunPython.noop),
+    ]
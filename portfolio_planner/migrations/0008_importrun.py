@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:05
+
+from django.db import migrations, models
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio_planner', '0007_opportunityrevenuerollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('status_changed', model_utils.fields.MonitorField(default=django.utils.timezone.now, monitor='status', verbose_name='status changed')),
+                ('command', models.CharField(help_text='Name of the import management command', max_length=191)),
+                ('file_name', models.CharField(help_text='Path of the CSV file that was imported', max_length=255)),
+                ('file_hash', models.CharField(db_index=True, help_text='SHA-256 hash of the CSV file contents', max_length=64)),
+                ('last_line', models.PositiveIntegerField(default=0, help_text='Last CSV line number committed to the database')),
+                ('row_count', models.PositiveIntegerField(default=0, help_text='Number of CSV rows committed to the database')),
+                ('status', model_utils.fields.StatusField(choices=[('running', 'running'), ('failed', 'failed'), ('completed', 'completed')], default='running', help_text='Status of the import run. One of running, failed or completed', max_length=100, no_check_for_status=True, verbose_name='status')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
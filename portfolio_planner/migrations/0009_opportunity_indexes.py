@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio_planner', '0008_importrun'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='opportunity',
+            index=models.Index(fields=['fiscal_year', 'status'], name='opp_fiscal_year_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='opportunity',
+            index=models.Index(fields=['brand', 'status'], name='opp_brand_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='opportunity',
+            index=models.Index(condition=models.Q(('approved', False)), fields=['brand'], name='opp_unapproved_brand_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='opportunity',
+            index=models.Index(condition=models.Q(('won_date__isnull', False)), fields=['won_date'], name='opp_won_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='opportunity',
+            index=models.Index(condition=models.Q(('lost_date__isnull', False)), fields=['lost_date'], name='opp_lost_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='opportunity',
+            index=models.Index(condition=models.Q(('abandoned_date__isnull', False)), fields=['abandoned_date'], name='opp_abandoned_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='periodperformance',
+            index=models.Index(fields=['opportunity_performance', 'fiscal_year'], name='periodperf_perf_fy_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_brand_visibility(apps, schema_editor):
+    """Build the visibility rows for the existing brands."""
+    Brand = apps.get_model('portfolio_planner', 'Brand')
+    BrandVisibility = apps.get_model('portfolio_planner', 'BrandVisibility')
+    User = apps.get_model('portfolio_planner', 'User')
+
+    account_managers = User.objects.filter(groups__name='account_manager')
+    business_unit_heads = User.objects.filter(groups__name='business_unit_head').exclude(pk__in=account_managers)
+
+    own_brands = Brand.objects.filter(user__in=account_managers).values_list('user_id', 'pk')
+    business_unit_brands = Brand.objects.filter(
+        org_business_unit__business_unit_manager__in=business_unit_heads
+    ).values_list('org_business_unit__business_unit_manager_id', 'pk')
+
+    rows = [
+        BrandVisibility(user_id=user_id, brand_id=brand_id)
+        for user_id, brand_id in own_brands.union(business_unit_brands)
+    ]
+    BrandVisibility.objects.bulk_create(rows, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('portfolio_planner', '0009_opportunity_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BrandVisibility',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visibility', to='portfolio_planner.brand')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='brand_visibility', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'brand')},
+            },
+        ),
+        migrations.RunPython(build_brand_visibility, migrations.RunPython.noop),
+    ]
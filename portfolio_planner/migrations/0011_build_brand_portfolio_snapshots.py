@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:30
+
+from django.db import migrations
+
+
+def build_brand_portfolio_snapshots(apps, schema_editor):
+    """Build the snapshots for the existing opportunities and performance history.
+
+    The G.R.O.W. figures are computed by the Brand and snapshot querysets, which historical models do not have, so this
+    uses the app's models, as the `rebuild_brand_snapshots` management command does. Their revenue is read from the
+    rollups built by 0007.
+    """
+    from portfolio_planner.models import BrandPortfolioSnapshot, FiscalYear
+
+    for fiscal_year in FiscalYear.objects.order_by('year'):
+        BrandPortfolioSnapshot.objects.refresh(fiscal_year)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio_planner', '0010_brandvisibility'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_brand_portfolio_snapshots, migrations.RunPython.noop),
+    ]
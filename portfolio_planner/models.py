@@ -1,14 +1,17 @@
 from datetime import date
 from decimal import Decimal
 from logging import getLogger
+from time import monotonic
 
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.db import IntegrityError
-from django.db.models import Subquery, OuterRef, Sum, Value, Q, DecimalField
+from django.db import transaction
+from django.db.models import Subquery, OuterRef, Sum, Value, Q, F, DecimalField, Case, When
 from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThan, GreaterThanOrEqual, LessThan, LessThanOrEqual
 from django.utils.translation import gettext_lazy as _
 from django_use_email_as_username.models import BaseUser, BaseUserManager
 from djmoney.money import Money
@@ -18,9 +21,9 @@ from model_utils import Choices
 from model_utils.fields import StatusField
 from model_utils.models import StatusModel
 from model_utils.models import TimeStampedModel
-from rolepermissions.checkers import has_role
 
-from sos.roles import BusinessUnitHead, SalesDirector
+from portfolio_planner.versions import DASHBOARD, FISCAL_CALENDAR, bump_version, get_version
+from sos.roles import AccountManager, BusinessUnitHead, SalesDirector
 
 
 logger = getLogger(__name__)
@@ -118,8 +121,10 @@ class OrgBusinessUnit(TimeStampedModel, StatusModel):
 
     def save(self, *args, **kwargs):
         """Save the model."""
-        if not (has_role(self.business_unit_manager, BusinessUnitHead) or
-                has_role(self.business_unit_manager, SalesDirector)):
+        from portfolio_planner.scopes import get_role_scope  # Imported here, as scopes depend on the models
+
+        scope = get_role_scope(self.business_unit_manager)
+        if not (scope.has_role(BusinessUnitHead) or scope.has_role(SalesDirector)):
             raise ValidationError("Assigned user must have the BusinessUnitHead or SalesDirector role.")
         super(OrgBusinessUnit, self).save(*args, **kwargs)
 
@@ -128,6 +133,115 @@ class OrgBusinessUnit(TimeStampedModel, StatusModel):
         return self.name
 
 
+# A brand is a Game Changer when its target is at least this share of all revenue in the last fiscal year
+GAME_CHANGER_THRESHOLD = Decimal('0.3')
+# A brand is a Real Opportunity when its target grows on its own last fiscal revenue by at least this share
+REAL_OPPORTUNITY_THRESHOLD = Decimal('0.1')
+
+GROW_BUCKETS = Choices(
+    ('Game Changer', 'game_changer', 'Game Changer'),
+    ('Real Opportunity', 'real_opportunity', 'Real Opportunity'),
+    ('Open', 'open', 'Open'),
+    ('Wish', 'wish', 'Wish'),
+)
+
+
+def grow_bucket_case(target, revenue, all_revenue) -> Case:
+    """Build the G.R.O.W. bucket expression.
+
+    Takes expressions for the brand target, the brand revenue for the last fiscal year and all revenue for the last
+    fiscal year, so that it can be used to annotate querysets as well as to update stored snapshots.
+    """
+
+    def at_least(value, base, threshold):
+        """Build the condition for `value / base >= threshold`, keeping the sign of base in mind."""
+        return (
+            (GreaterThan(base, 0) & GreaterThanOrEqual(value, base * threshold)) |
+            (LessThan(base, 0) & LessThanOrEqual(value, base * threshold))
+        )
+
+    return Case(
+        When(at_least(target, all_revenue, GAME_CHANGER_THRESHOLD), then=Value(GROW_BUCKETS.game_changer)),
+        When(at_least(target, revenue, 1 + REAL_OPPORTUNITY_THRESHOLD), then=Value(GROW_BUCKETS.real_opportunity)),
+        When(GreaterThan(revenue, 0), then=Value(GROW_BUCKETS.open)),
+        default=Value(GROW_BUCKETS.wish),
+        output_field=models.CharField(),
+    )
+
+
+def revenue_last_fiscal_subquery(last_fiscal_year: 'FiscalYear', **filters) -> Subquery:
+    """Subquery summing active and won opportunity revenue in the last fiscal year.
+
+    Without extra filters this is a scalar subquery over all revenue. Grouping on the (single) fiscal year means the
+    database only has to evaluate it once. Pass OuterRef filters to correlate it to an outer query instead.
+    """
+    revenue = OpportunityRevenueRollup.objects.filter(
+        fiscal_year=last_fiscal_year,
+        opportunity__status__in=['active', 'won'],
+        **filters
+    ).order_by().values('fiscal_year').annotate(total=Sum('total_revenue')).values('total')
+
+    return Subquery(revenue, output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+class BrandQuerySet(models.QuerySet):
+    """Brand QuerySet.
+
+    Provides methods to annotate brands with G.R.O.W. portfolio data.
+    """
+
+    def with_grow_bucket(self, last_fiscal_year: 'FiscalYear', fiscal_year: 'FiscalYear' = None):
+        """Add G.R.O.W. data to the queryset.
+
+        Provides the following fields:
+        - total_target: Sum of the target for the brand's opportunities in the fiscal year, or all years if not given
+        - total_revenue_last_fiscal: Revenue in the last fiscal year for the brand's active and won opportunities
+        - grow_bucket: One of Game Changer, Real Opportunity, Open or Wish
+
+        Everything is computed in SQL using correlated subqueries, so the brands can be classified, aggregated, sorted
+        and paginated in the database without running extra queries per brand.
+        """
+        decimal_field = DecimalField(max_digits=14, decimal_places=2)
+        zero_value = Value(Decimal('0.00'), output_field=decimal_field)
+
+        brand_opportunities = Opportunity.objects.filter(brand=OuterRef('pk'))
+        if fiscal_year is not None:
+            brand_opportunities = brand_opportunities.filter(fiscal_year=fiscal_year)
+        brand_target = brand_opportunities.order_by().values('brand').annotate(total=Sum('target')).values('total')
+
+        return self.annotate(
+            total_target=Coalesce(Subquery(brand_target, output_field=decimal_field), zero_value),
+            total_revenue_last_fiscal=Coalesce(
+                revenue_last_fiscal_subquery(last_fiscal_year, opportunity__brand=OuterRef('pk')),
+                zero_value
+            ),
+            all_revenue_last_fiscal=Coalesce(revenue_last_fiscal_subquery(last_fiscal_year), zero_value),
+        ).annotate(
+            grow_bucket=grow_bucket_case(
+                F('total_target'), F('total_revenue_last_fiscal'), F('all_revenue_last_fiscal')
+            )
+        )
+
+    def with_portfolio_snapshot(self, fiscal_year: 'FiscalYear'):
+        """Add precomputed G.R.O.W. data for the fiscal year to the queryset.
+
+        Provides the same fields as `with_grow_bucket`, but reads them from the brand portfolio snapshot with a single
+        join. Brands without a snapshot are treated as having no target and no revenue.
+        """
+        zero_value = Value(Decimal('0.00'), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+        return self.annotate(
+            snapshot=models.FilteredRelation(
+                'portfolio_snapshots',
+                condition=Q(portfolio_snapshots__fiscal_year=fiscal_year),
+            ),
+        ).annotate(
+            total_target=Coalesce(F('snapshot__total_target'), zero_value),
+            total_revenue_last_fiscal=Coalesce(F('snapshot__total_revenue_last_fiscal'), zero_value),
+            grow_bucket=Coalesce(F('snapshot__grow_bucket'), Value(GROW_BUCKETS.wish)),
+        )
+
+
 class Brand(TimeStampedModel, StatusModel):
     """Brand model."""
 
@@ -164,6 +278,8 @@ class Brand(TimeStampedModel, StatusModel):
         help_text='The Organisation Business Unit that the Brand is managed by. Cannot be null.',
     )
 
+    objects = BrandQuerySet.as_manager()
+
     def __str__(self):
         """Provide human readable representation."""
         return self.name
@@ -206,6 +322,61 @@ class BrandBusinessUnit(TimeStampedModel, StatusModel):
         return f"{self.brand.name} - {self.name}"
 
 
+class BrandVisibilityQuerySet(models.QuerySet):
+    """Brand Visibility QuerySet.
+
+    Provides methods to recompute which brands users can see from their roles.
+    """
+
+    def calculate(self, users):
+        """Calculate unsaved visibility rows for the given User queryset.
+
+        Account Managers see their own brands, and Business Unit Heads the brands of the business units they manage. A
+        user with both roles is scoped as an Account Manager. Sales Directors see every brand, so they have no rows.
+        """
+        account_managers = users.filter(groups__name=AccountManager.get_name())
+        business_unit_heads = users.filter(groups__name=BusinessUnitHead.get_name()).exclude(pk__in=account_managers)
+
+        own_brands = Brand.objects.filter(user__in=account_managers).values_list('user_id', 'pk')
+        business_unit_brands = Brand.objects.filter(
+            org_business_unit__business_unit_manager__in=business_unit_heads
+        ).values_list('org_business_unit__business_unit_manager_id', 'pk')
+
+        for user_id, brand_id in own_brands.union(business_unit_brands):
+            yield self.model(user_id=user_id, brand_id=brand_id)
+
+    def refresh(self, users):
+        """Recompute the visibility rows for the given User queryset."""
+        user_ids = list(users.values_list('pk', flat=True))
+        with transaction.atomic():
+            self.model.objects.filter(user_id__in=user_ids).delete()
+            rows = self.model.objects.bulk_create(
+                self.calculate(users.model.objects.filter(pk__in=user_ids)),
+                batch_size=5000
+            )
+
+        return len(rows)
+
+
+class BrandVisibility(models.Model):
+    """Brand Visibility model.
+
+    The brands each Account Manager and Business Unit Head can see, so that role scoping is a filter on brand IDs rather
+    than a join through the brand's user or business unit manager. It is maintained whenever brands, business unit
+    managers or group memberships change. Use the `rebuild_brand_visibility` management command to rebuild it.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='brand_visibility', on_delete=models.CASCADE)
+    brand = models.ForeignKey(Brand, related_name='visibility', on_delete=models.CASCADE)
+
+    objects = BrandVisibilityQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('user', 'brand')
+
+    def __str__(self):
+        return f"{self.user} - {self.brand}"
+
+
 class Product(TimeStampedModel):
     """Product model."""
 
@@ -238,14 +409,94 @@ class FiscalYear(models.Model):
             # set all other records to is_current = False
             FiscalYear.objects.exclude(id=self.id).update(is_current=False)
         super().save(*args, **kwargs)
+        invalidate_fiscal_calendar()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        invalidate_fiscal_calendar()
+        return result
 
     def __str__(self):
         return str(self.year)
 
 
+class FiscalCalendar:
+    """All the fiscal years, indexed by year.
+
+    The fiscal years are shared by every caller, so they must not be modified.
+    """
+
+    def __init__(self, fiscal_years):
+        self.fiscal_years = {fiscal_year.year: fiscal_year for fiscal_year in fiscal_years}
+        self.current_year = next(
+            (fiscal_year.year for fiscal_year in self.fiscal_years.values() if fiscal_year.is_current), None
+        )
+
+    def get(self, year: int) -> FiscalYear:
+        """Get a fiscal year by year, raising FiscalYear.DoesNotExist if there is none."""
+        try:
+            return self.fiscal_years[year]
+        except KeyError:
+            raise FiscalYear.DoesNotExist(f'Fiscal year {year} does not exist')
+
+    def offset(self, offset: int) -> FiscalYear:
+        """Get the fiscal year the given number of years after the current one, or before it if negative."""
+        if self.current_year is None:
+            raise FiscalYear.DoesNotExist('There is no current fiscal year')
+        return self.get(self.current_year + offset)
+
+    @property
+    def current(self) -> FiscalYear:
+        return self.offset(0)
+
+    @property
+    def previous(self) -> FiscalYear:
+        return self.offset(-1)
+
+
+# The fiscal calendar is loaded once per process and reused until a fiscal year changes, or it expires
+_fiscal_calendar = (None, None, None)
+
+
+def get_fiscal_calendar() -> FiscalCalendar:
+    """Get the fiscal calendar, only loading the fiscal years when they have changed.
+
+    The calendar is also reloaded once it is FISCAL_CALENDAR_TIMEOUT seconds old, as a change made by another process
+    only bumps the version in that process when the cache is not shared. A calendar loaded inside a transaction is not
+    kept, as it may include changes that are later rolled back.
+    """
+    global _fiscal_calendar
+
+    version = get_version(FISCAL_CALENDAR)
+    loaded_version, loaded_at, calendar = _fiscal_calendar
+    if calendar is None or loaded_version != version or monotonic() - loaded_at >= settings.FISCAL_CALENDAR_TIMEOUT:
+        calendar = FiscalCalendar(FiscalYear.objects.all())
+        if not transaction.get_connection().in_atomic_block:
+            _fiscal_calendar = (version, monotonic(), calendar)
+
+    return calendar
+
+
+def invalidate_fiscal_calendar():
+    """Reload the fiscal calendar in every process on next use."""
+    global _fiscal_calendar
+
+    _fiscal_calendar = (None, None, None)
+    bump_version(FISCAL_CALENDAR)
+
+
 def get_current_fiscal_year():
     """Get the current fiscal year."""
-    return FiscalYear.objects.get(is_current=True).id
+    return get_fiscal_calendar().current.id
+
+
+# The fiscal year periods that make up each quarter
+QUARTER_PERIODS = {
+    1: [1, 2, 3],
+    2: [4, 5, 6],
+    3: [7, 8, 9],
+    4: [10, 11, 12],
+}
 
 
 def convert_to_money(value: Decimal, currency: str = 'ZAR') -> Money:
@@ -270,7 +521,7 @@ class OpportunityQuerySet(models.QuerySet):
         """Add revenue data to the queryset.
 
         Provides the following fields:
-        - total_revenue: Sum all revenue for the opportunity
+        - total_revenue: Sum all revenue for the opportunity in the fiscal year
         - q1_revenue: Revenue in periods 1, 2 and 3
         - q2_revenue: Revenue in periods 4, 5 and 6
         - q3_revenue: Revenue in periods 7, 8 and 9
@@ -284,40 +535,22 @@ class OpportunityQuerySet(models.QuerySet):
         """
         zero_value = Value(Decimal('0.00'), output_field=DecimalField(max_digits=14, decimal_places=2))
 
-        def quarterly_revenue_subquery(quarter):
-            periods = {
-                1: [1, 2, 3],
-                2: [4, 5, 6],
-                3: [7, 8, 9],
-                4: [10, 11, 12]
-            }.get(quarter, [])
-
-            return Subquery(
-                OpportunityPerformance.objects.filter(
-                    opportunity=OuterRef('pk'),
-                    fiscal_year=fiscal_year
-                ).annotate(
-                    quarterly_revenue=Coalesce(Sum(
-                        'periods__revenue',
-                        filter=Q(periods__period__in=periods),
-                        output_field=MoneyField(
-                            max_digits=14,
-                            decimal_places=2,
-                            default_currency='ZAR'
-                        )
-                    ),
-                        zero_value
-                    )
-                ).values('quarterly_revenue')[:1]
-            )
+        def revenue(field):
+            return Coalesce(F(f'fiscal_year_revenue__{field}'), zero_value)
 
+        # The revenue is rolled up per opportunity and fiscal year whenever the periods change, so this is a plain join
+        # to a single rollup row rather than an aggregate over the performance periods.
         return self.annotate(
-            total_revenue=Coalesce(Sum('opportunityperformance__periods__revenue',
-                                       output_field=DecimalField(max_digits=14, decimal_places=2)), zero_value),
-            q1_revenue=quarterly_revenue_subquery(1),
-            q2_revenue=quarterly_revenue_subquery(2),
-            q3_revenue=quarterly_revenue_subquery(3),
-            q4_revenue=quarterly_revenue_subquery(4),
+            fiscal_year_revenue=models.FilteredRelation(
+                'revenue_rollups',
+                condition=Q(revenue_rollups__fiscal_year=fiscal_year),
+            ),
+        ).annotate(
+            total_revenue=revenue('total_revenue'),
+            q1_revenue=revenue('q1_revenue'),
+            q2_revenue=revenue('q2_revenue'),
+            q3_revenue=revenue('q3_revenue'),
+            q4_revenue=revenue('q4_revenue'),
             revenue_fiscal_year=Value(fiscal_year.year, output_field=models.IntegerField()),
         )
 
@@ -381,6 +614,21 @@ class Opportunity(TimeStampedModel, StatusModel):
             'fiscal_year',
         )
 
+        # Indexes for the filters used across the portfolio planner, dashboard and home pages. The status dates are only
+        # set once an opportunity is closed, so their indexes only cover those rows.
+        indexes = [
+            models.Index(fields=['fiscal_year', 'status'], name='opp_fiscal_year_status_idx'),
+            models.Index(fields=['brand', 'status'], name='opp_brand_status_idx'),
+            models.Index(fields=['brand'], condition=Q(approved=False), name='opp_unapproved_brand_idx'),
+            models.Index(fields=['won_date'], condition=Q(won_date__isnull=False), name='opp_won_date_idx'),
+            models.Index(fields=['lost_date'], condition=Q(lost_date__isnull=False), name='opp_lost_date_idx'),
+            models.Index(
+                fields=['abandoned_date'],
+                condition=Q(abandoned_date__isnull=False),
+                name='opp_abandoned_date_idx'
+            ),
+        ]
+
         verbose_name_plural = 'Opportunities'
 
     def save(self, *args, **kwargs):
@@ -422,13 +670,22 @@ class OpportunityPerformance(models.Model):
     opportunity = models.ForeignKey(Opportunity, on_delete=models.CASCADE)
     fiscal_year = models.ForeignKey(FiscalYear, on_delete=models.CASCADE)
 
+    @property
+    def revenue_rollup(self):
+        """Get the denormalised revenue rollup for the opportunity performance, if it has been built."""
+        return OpportunityRevenueRollup.objects.filter(
+            opportunity_id=self.opportunity_id,
+            fiscal_year_id=self.fiscal_year_id
+        ).first()
+
     @property
     def total_revenue(self):
         """Get the total revenue for the opportunity performance.
 
-        Uses the related name `periods` to get all the periods for the opportunity performance.
+        Reads the total from the revenue rollup rather than summing the periods.
         """
-        return self.periods.aggregate(Sum('revenue'))['revenue__sum'] or 0
+        rollup = self.revenue_rollup
+        return rollup.total_revenue if rollup else 0
 
     @property
     def q1_revenue(self):
@@ -452,18 +709,11 @@ class OpportunityPerformance(models.Model):
 
     def get_quarterly_revenue(self, quarter: int):
         """Get the revenue for the given quarter."""
-        if quarter == 1:
-            periods = [1, 2, 3]
-        elif quarter == 2:
-            periods = [4, 5, 6]
-        elif quarter == 3:
-            periods = [7, 8, 9]
-        elif quarter == 4:
-            periods = [10, 11, 12]
-        else:
-            periods = []
-
-        return self.periods.filter(period__in=periods).aggregate(Sum('revenue'))['revenue__sum'] or 0
+        if quarter not in QUARTER_PERIODS:
+            return 0
+
+        rollup = self.revenue_rollup
+        return getattr(rollup, f'q{quarter}_revenue') if rollup else 0
 
     class Meta:
         unique_together = ('opportunity', 'fiscal_year')
@@ -491,6 +741,231 @@ class PeriodPerformance(models.Model):
 
     class Meta:
         unique_together = ('opportunity_performance', 'period')
+        indexes = [
+            models.Index(fields=['opportunity_performance', 'fiscal_year'], name='periodperf_perf_fy_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        """Save the period in a transaction, so its revenue rollup is refreshed by the post_save signal atomically.
+
+        Deletes need no such wrapping, as Django already runs them and their signals in a transaction.
+        """
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.opportunity_performance} - Period {self.period} - {self.revenue}"
+
+
+class OpportunityRevenueRollupQuerySet(models.QuerySet):
+    """Opportunity Revenue Rollup QuerySet.
+
+    Provides methods to recompute the rollups from the performance periods.
+    """
+
+    def calculate(self, performances):
+        """Calculate unsaved rollups for the given OpportunityPerformance queryset.
+
+        Sums every period for all the opportunity performances in one query.
+        """
+        decimal_field = DecimalField(max_digits=14, decimal_places=2)
+        zero_value = Value(Decimal('0.00'), output_field=decimal_field)
+        period_revenue = {
+            f'period_{period}_revenue': Coalesce(
+                Sum('periods__revenue', filter=Q(periods__period=period), output_field=decimal_field),
+                zero_value
+            )
+            for period in range(1, 13)
+        }
+
+        for row in performances.order_by().values('opportunity_id', 'fiscal_year_id').annotate(**period_revenue):
+            rollup = self.model(**row)
+            rollup.calculate_totals()
+            yield rollup
+
+    def refresh(self, performances):
+        """Recompute the rollups for the given OpportunityPerformance queryset.
+
+        Calculates the rollups in one query and upserts them in batches.
+        """
+        rollups = list(self.calculate(performances))
+
+        self.model.objects.bulk_create(
+            rollups,
+            batch_size=5000,
+            update_conflicts=True,
+            unique_fields=['opportunity', 'fiscal_year'],
+            update_fields=self.model.REVENUE_FIELDS,
+        )
+
+        return len(rollups)
+
+
+class OpportunityRevenueRollup(models.Model):
+    """Opportunity Revenue Rollup model.
+
+    Denormalised revenue for an opportunity in a fiscal year, holding the 12 periods, the quarters and the total. It is
+    maintained whenever the performance periods change, so revenue can be read with a join instead of an aggregate.
+    Use the `rebuild_revenue_rollups` management command to verify or rebuild it.
+    """
+    opportunity = models.ForeignKey(Opportunity, related_name='revenue_rollups', on_delete=models.CASCADE)
+    fiscal_year = models.ForeignKey(FiscalYear, on_delete=models.CASCADE)
+    period_1_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    period_2_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    period_3_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    period_4_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    period_5_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    period_6_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    period_7_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    period_8_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    period_9_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    period_10_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    period_11_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    period_12_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    q1_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    q2_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    q3_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    q4_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    total_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    REVENUE_FIELDS = [
+        *(f'period_{period}_revenue' for period in range(1, 13)),
+        'q1_revenue',
+        'q2_revenue',
+        'q3_revenue',
+        'q4_revenue',
+        'total_revenue',
+    ]
+
+    objects = OpportunityRevenueRollupQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('opportunity', 'fiscal_year')
+
+    @property
+    def period_revenues(self) -> list:
+        """Get the revenue for periods 1 to 12."""
+        return [getattr(self, f'period_{period}_revenue') for period in range(1, 13)]
+
+    def calculate_totals(self):
+        """Calculate the quarter and total revenue from the periods."""
+        for quarter, periods in QUARTER_PERIODS.items():
+            setattr(self, f'q{quarter}_revenue', sum(getattr(self, f'period_{period}_revenue') for period in periods))
+        self.total_revenue = sum(self.period_revenues)
+
+    def __str__(self):
+        return f"{self.opportunity} - {self.fiscal_year} - {self.total_revenue}"
+
+
+class BrandPortfolioSnapshotQuerySet(models.QuerySet):
+    """Brand Portfolio Snapshot QuerySet.
+
+    Provides a method to recompute the snapshot from the underlying opportunities and performance history.
+    """
+
+    def refresh(self, fiscal_year: FiscalYear, brand_ids=None):
+        """Recompute the snapshot for the fiscal year.
+
+        Target and revenue are recomputed for the given brands, or for every brand if none are given. The buckets are
+        then reclassified for the whole fiscal year in one update, because the Game Changer threshold depends on the
+        revenue across all brands.
+        """
+        last_fiscal_year = get_fiscal_calendar().fiscal_years.get(fiscal_year.year - 1)
+
+        brands = Brand.objects.all() if brand_ids is None else Brand.objects.filter(pk__in=brand_ids)
+        figures = brands.with_grow_bucket(last_fiscal_year, fiscal_year=fiscal_year).values_list(
+            'pk', 'total_target', 'total_revenue_last_fiscal'
+        )
+
+        with transaction.atomic():
+            self.model.objects.bulk_create(
+                [
+                    self.model(
+                        brand_id=brand_id,
+                        fiscal_year=fiscal_year,
+                        total_target=total_target,
+                        total_revenue_last_fiscal=total_revenue_last_fiscal,
+                    )
+                    for brand_id, total_target, total_revenue_last_fiscal in figures
+                ],
+                update_conflicts=True,
+                unique_fields=['brand', 'fiscal_year'],
+                update_fields=['total_target', 'total_revenue_last_fiscal', 'modified'],
+            )
+
+            zero_value = Value(Decimal('0.00'), output_field=DecimalField(max_digits=14, decimal_places=2))
+            self.model.objects.filter(fiscal_year=fiscal_year).update(
+                grow_bucket=grow_bucket_case(
+                    F('total_target'),
+                    F('total_revenue_last_fiscal'),
+                    Coalesce(revenue_last_fiscal_subquery(last_fiscal_year), zero_value),
+                )
+            )
+
+            # The dashboard is built from the snapshots
+            bump_version(DASHBOARD)
+
+
+class BrandPortfolioSnapshot(TimeStampedModel):
+    """Brand Portfolio Snapshot model.
+
+    Precomputed G.R.O.W. figures for a brand in a fiscal year, so that the dashboard does not have to aggregate the
+    opportunities and performance history on every request. Kept up to date by signals, and can be rebuilt from scratch
+    with the `rebuild_brand_snapshots` management command.
+    """
+    brand = models.ForeignKey(Brand, related_name='portfolio_snapshots', on_delete=models.CASCADE)
+    fiscal_year = models.ForeignKey(FiscalYear, on_delete=models.CASCADE)
+    total_target = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text='Sum of the target for the brand opportunities in the fiscal year'
+    )
+    total_revenue_last_fiscal = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text='Revenue in the previous fiscal year for the brand active and won opportunities'
+    )
+    grow_bucket = models.CharField(
+        max_length=32,
+        choices=GROW_BUCKETS,
+        default=GROW_BUCKETS.wish,
+        help_text='G.R.O.W. bucket of the brand. One of Game Changer, Real Opportunity, Open or Wish'
+    )
+
+    objects = BrandPortfolioSnapshotQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('brand', 'fiscal_year')
+
+    def __str__(self):
+        return f"{self.brand} - {self.fiscal_year} - {self.grow_bucket}"
+
+
+class ImportRun(TimeStampedModel, StatusModel):
+    """Import Run model.
+
+    Records how far a streaming CSV import has got, so that an interrupted import can be resumed from the last committed
+    chunk. The file is identified by its path or a hash of its contents, so it can be fixed and the import resumed.
+    """
+
+    STATUS = Choices(
+        'running',
+        'failed',
+        'completed',
+    )
+
+    command = models.CharField(max_length=191, help_text='Name of the import management command')
+    file_name = models.CharField(max_length=255, help_text='Path of the CSV file that was imported')
+    file_hash = models.CharField(max_length=64, db_index=True, help_text='SHA-256 hash of the CSV file contents')
+    last_line = models.PositiveIntegerField(default=0, help_text='Last CSV line number committed to the database')
+    row_count = models.PositiveIntegerField(default=0, help_text='Number of CSV rows committed to the database')
+    status = StatusField(
+        _('status'),
+        default='running',
+        help_text='Status of the import run. One of running, failed or completed'
+    )
+
+    def __str__(self):
+        return f"{self.command} - {self.file_name} - {self.status}"
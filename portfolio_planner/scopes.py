@@ -0,0 +1,100 @@
+"""Role scopes: the role a user has, and the brands it lets them see.
+
+Resolving a scope queries the user's groups and their brands, so scopes are cached. The cache key includes a version
+that is bumped whenever group membership, a brand or an organisation business unit changes, which invalidates every
+cached scope at once. Those changes are rare compared to page views. Unless the cache is shared, a change made by
+another process does not bump the version here, so scopes are then only cached briefly.
+"""
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from rolepermissions.roles import get_user_roles
+
+from portfolio_planner.models import BrandVisibility
+from portfolio_planner.versions import ROLE_SCOPES, bump_version, get_version, is_cache_shared
+from sos.roles import AccountManager, BusinessUnitHead, SalesDirector
+
+
+# A user with more than one role is scoped by the first of them
+ROLE_PRECEDENCE = (AccountManager, BusinessUnitHead, SalesDirector)
+
+
+class RoleScope:
+    """The roles of a user, and the IDs of the brands they can see.
+
+    `brand_ids` is None when the user's brands are not restricted, as for Sales Directors.
+    """
+
+    def __init__(self, roles: frozenset, brand_ids: frozenset = None):
+        self.roles = roles
+        self.brand_ids = brand_ids
+
+    @property
+    def role(self):
+        """The role the user is scoped by, or None if they have no role."""
+        for role in ROLE_PRECEDENCE:
+            if role.get_name() in self.roles:
+                return role
+        return None
+
+    def has_role(self, role) -> bool:
+        return role.get_name() in self.roles
+
+    @property
+    def fingerprint(self) -> str:
+        """A hash of the scope. Users with the same role and brands have the same fingerprint, so can share caches."""
+        role = self.role.get_name() if self.role else ''
+        brand_ids = 'all' if self.brand_ids is None else ','.join(map(str, sorted(self.brand_ids)))
+        return md5(f'{role}:{brand_ids}'.encode()).hexdigest()
+
+    def __repr__(self):
+        return f'RoleScope(roles={sorted(self.roles)}, brands={None if self.brand_ids is None else len(self.brand_ids)})'
+
+
+def resolve_role_scope(user) -> RoleScope:
+    """Resolve the role scope of a user from the database."""
+    if not user.is_authenticated:
+        return RoleScope(frozenset(), frozenset())
+
+    scope = RoleScope(frozenset(role.get_name() for role in get_user_roles(user)))
+
+    # Sales Directors see every brand and users without a role see none. The other roles see the brands precomputed for
+    # them.
+    if scope.role is None:
+        scope.brand_ids = frozenset()
+    elif scope.role is not SalesDirector:
+        scope.brand_ids = frozenset(BrandVisibility.objects.filter(user=user).values_list('brand_id', flat=True))
+
+    return scope
+
+
+def get_role_scope(user) -> RoleScope:
+    """Get the role scope of a user, from the cache if possible.
+
+    The scope is also kept on the user instance, so it is only looked up once for the life of the instance, which is
+    a single request for `request.user`.
+    """
+    scope = getattr(user, '_role_scope', None)
+    if scope is not None:
+        return scope
+
+    if user.is_authenticated:
+        key = f'role_scope:{get_version(ROLE_SCOPES).token}:{user.pk}'
+        scope = cache.get(key)
+        if scope is None:
+            scope = resolve_role_scope(user)
+            timeout = settings.ROLE_SCOPE_CACHE_TIMEOUT
+            if not is_cache_shared():
+                timeout = min(timeout, settings.LOCAL_ROLE_SCOPE_CACHE_TIMEOUT)
+            cache.set(key, scope, timeout)
+    else:
+        scope = resolve_role_scope(user)
+
+    user._role_scope = scope
+    return scope
+
+
+def invalidate_role_scopes():
+    """Invalidate every cached role scope."""
+    bump_version(ROLE_SCOPES)
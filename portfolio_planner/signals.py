@@ -1,7 +1,28 @@
 """PortfolioPlanner signals."""
-from django.db.models.signals import post_save
+from collections import defaultdict
+from threading import local
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from .models import Brand, BrandBusinessUnit
+from .models import BrandPortfolioSnapshot
+from .models import BrandVisibility
+from .models import FiscalYear
+from .models import Opportunity
+from .models import OpportunityPerformance
+from .models import OpportunityRevenueRollup
+from .models import OrgBusinessUnit
+from .models import PeriodPerformance
+from .models import User
+from .scopes import invalidate_role_scopes
+from .versions import DASHBOARD, bump_version
+
+
+# Brand portfolio snapshot refreshes are queued per thread and run once the surrounding transaction commits, so that a
+# batch of changes in one transaction only refreshes each brand and fiscal year once.
+_pending = local()
 
 
 @receiver(post_save, sender=Brand)
@@ -13,3 +34,176 @@ def create_default_business_unit(sender, instance, created, **kwargs):
             brand=instance,
             user=instance.user
         )
+
+
+def queue_snapshot_refresh(fiscal_year_ids, brand_id=None):
+    """Queue a brand portfolio snapshot refresh for the fiscal years.
+
+    If no brand is given, every brand is refreshed for those fiscal years.
+    """
+    snapshots = getattr(_pending, 'snapshots', None)
+    if snapshots is None:
+        snapshots = _pending.snapshots = defaultdict(set)
+
+    for fiscal_year_id in fiscal_year_ids:
+        if brand_id is None:
+            snapshots[fiscal_year_id] = None
+        elif snapshots[fiscal_year_id] is not None:
+            snapshots[fiscal_year_id].add(brand_id)
+
+    transaction.on_commit(refresh_queued_snapshots)
+
+
+def refresh_queued_snapshots():
+    """Refresh all queued brand portfolio snapshots."""
+    snapshots = getattr(_pending, 'snapshots', None)
+    _pending.snapshots = None
+    if not snapshots:
+        return
+
+    for fiscal_year in FiscalYear.objects.filter(pk__in=snapshots.keys()):
+        BrandPortfolioSnapshot.objects.refresh(fiscal_year, brand_ids=snapshots[fiscal_year.pk])
+
+
+def opportunity_snapshot_fiscal_years(opportunity_id: int, fiscal_year_id: int):
+    """Get the fiscal years whose brand portfolio snapshot depends on the opportunity.
+
+    That is the fiscal year of its target, plus the fiscal year after each year it has performance history for.
+    """
+    revenue_years = OpportunityPerformance.objects.filter(
+        opportunity_id=opportunity_id
+    ).annotate(next_year=F('fiscal_year__year') + 1).values('next_year')
+
+    return FiscalYear.objects.filter(Q(pk=fiscal_year_id) | Q(year__in=revenue_years)).values_list('pk', flat=True)
+
+
+@receiver(pre_save, sender=Opportunity)
+@receiver(pre_delete, sender=Opportunity)
+def refresh_previous_opportunity_snapshots(sender, instance, **kwargs):
+    """Refresh the snapshots the opportunity counted towards before it was changed or deleted."""
+    if instance.pk is None:
+        return
+
+    previous = Opportunity.objects.filter(pk=instance.pk).values_list('brand_id', 'fiscal_year_id').first()
+    if previous is not None:
+        brand_id, fiscal_year_id = previous
+        queue_snapshot_refresh(opportunity_snapshot_fiscal_years(instance.pk, fiscal_year_id), brand_id=brand_id)
+
+
+@receiver(post_save, sender=Opportunity)
+def refresh_opportunity_snapshots(sender, instance, **kwargs):
+    """Refresh the snapshots the opportunity counts towards."""
+    queue_snapshot_refresh(
+        opportunity_snapshot_fiscal_years(instance.pk, instance.fiscal_year_id),
+        brand_id=instance.brand_id
+    )
+
+
+@receiver(post_save, sender=PeriodPerformance)
+@receiver(post_delete, sender=PeriodPerformance)
+def refresh_revenue_rollup(sender, instance, **kwargs):
+    """Recompute the revenue rollup in the same transaction as the period change.
+
+    PeriodPerformance.save runs in a transaction for this, and deletes always do. Fixtures are loaded raw, so their
+    rollups are built with the `rebuild_revenue_rollups` command instead.
+    """
+    if kwargs.get('raw'):
+        return
+
+    OpportunityRevenueRollup.objects.refresh(
+        OpportunityPerformance.objects.filter(pk=instance.opportunity_performance_id)
+    )
+
+
+@receiver(post_delete, sender=OpportunityPerformance)
+def delete_revenue_rollup(sender, instance, **kwargs):
+    """Remove the revenue rollup along with the performance it rolls up."""
+    OpportunityRevenueRollup.objects.filter(
+        opportunity_id=instance.opportunity_id,
+        fiscal_year_id=instance.fiscal_year_id
+    ).delete()
+
+
+@receiver(post_save, sender=PeriodPerformance)
+@receiver(post_delete, sender=PeriodPerformance)
+def refresh_period_performance_snapshots(sender, instance, **kwargs):
+    """Refresh the snapshot for the fiscal year after the revenue was earned."""
+    performance = OpportunityPerformance.objects.filter(
+        pk=instance.opportunity_performance_id
+    ).values_list('opportunity__brand_id', 'fiscal_year__year').first()
+    if performance is None:
+        return
+
+    brand_id, year = performance
+    queue_snapshot_refresh(FiscalYear.objects.filter(year=year + 1).values_list('pk', flat=True), brand_id=brand_id)
+
+
+@receiver(post_save, sender=FiscalYear)
+def refresh_fiscal_year_snapshots(sender, instance, created, **kwargs):
+    """Build the snapshot for every brand when a new fiscal year is added."""
+    if created:
+        queue_snapshot_refresh([instance.pk])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def refresh_group_brand_visibility(sender, instance, action, reverse, pk_set, **kwargs):
+    """Brand visibility and role scopes depend on group membership, which is how roles are assigned."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        # Users were added to or removed from the group. pk_set is None when the group is cleared.
+        users = User.objects.filter(pk__in=pk_set) if pk_set is not None else User.objects.all()
+    else:
+        instance.__dict__.pop('_role_scope', None)
+        users = User.objects.filter(pk=instance.pk)
+
+    BrandVisibility.objects.refresh(users)
+    invalidate_role_scopes()
+
+
+@receiver(post_save, sender=Brand)
+def refresh_brand_visibility(sender, instance, **kwargs):
+    """Refresh the visibility for the brand's user and business unit manager, and whoever could see it before."""
+    if kwargs.get('raw'):
+        return
+
+    BrandVisibility.objects.refresh(User.objects.filter(
+        Q(pk=instance.user_id) |
+        Q(org_business_units=instance.org_business_unit_id) |
+        Q(brand_visibility__brand=instance)
+    ))
+    invalidate_role_scopes()
+
+
+@receiver(post_save, sender=OrgBusinessUnit)
+def refresh_business_unit_visibility(sender, instance, **kwargs):
+    """Refresh the visibility for the business unit manager, and whoever could see its brands before."""
+    if kwargs.get('raw'):
+        return
+
+    BrandVisibility.objects.refresh(User.objects.filter(
+        Q(pk=instance.business_unit_manager_id) |
+        Q(brand_visibility__brand__org_business_unit=instance)
+    ))
+    invalidate_role_scopes()
+
+
+@receiver(post_delete, sender=Brand)
+@receiver(post_delete, sender=OrgBusinessUnit)
+def invalidate_brand_role_scopes(sender, **kwargs):
+    """The visibility of deleted brands is deleted along with them, but the cached role scopes still include them."""
+    invalidate_role_scopes()
+
+
+@receiver(post_save, sender=Opportunity)
+@receiver(post_delete, sender=Opportunity)
+@receiver(post_save, sender=PeriodPerformance)
+@receiver(post_delete, sender=PeriodPerformance)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=FiscalYear)
+@receiver(post_delete, sender=FiscalYear)
+def invalidate_dashboard_fragments(sender, **kwargs):
+    """The dashboard fragments are cached until the data they are built from changes."""
+    bump_version(DASHBOARD)
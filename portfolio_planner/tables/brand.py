@@ -2,10 +2,20 @@ from django.utils.translation import gettext_lazy as _
 import django_tables2 as tables
 
 from portfolio_planner.models import Brand
+from portfolio_planner.models import convert_to_money
 
 
 class BrandTable(tables.Table):
-    """Brand Table."""
+    """Brand Table.
+
+    The G.R.O.W. bucket, target and last fiscal revenue columns must be annotations on the queryset, for example from
+    `BrandQuerySet.with_portfolio_snapshot`, so that they can be sorted in the database.
+    """
+
+    # Break ties on the primary key, so the pages are stable when many brands share a bucket or have no target
+    grow_bucket = tables.Column(order_by=('grow_bucket', 'pk'))
+    total_target = tables.Column(order_by=('total_target', 'pk'))
+    total_revenue_last_fiscal = tables.Column(order_by=('total_revenue_last_fiscal', 'pk'))
 
     class Meta:
         model = Brand
@@ -30,3 +40,11 @@ class BrandTable(tables.Table):
                 'class': 'thead-light'
             }
         }
+
+    def render_total_target(self, value):
+        """Render the annotated target as Money."""
+        return convert_to_money(value)
+
+    def render_total_revenue_last_fiscal(self, value):
+        """Render the annotated revenue as Money."""
+        return convert_to_money(value)
@@ -2,11 +2,23 @@ from django.utils.translation import gettext_lazy as _
 import django_tables2 as tables
 
 from portfolio_planner.models import Opportunity
+from portfolio_planner.models import convert_to_money
 
 
-class OpportunityTable(tables.Table):
+class TotalRevenueMixin:
+    """Renders the annotated total revenue column of an opportunity table."""
+
+    def render_total_revenue(self, value):
+        """Render the annotated revenue as Money."""
+        return convert_to_money(value)
+
+
+class OpportunityTable(TotalRevenueMixin, tables.Table):
     """Opportunity Table."""
 
+    # Columns that are never NULL, which KeysetPaginator can seek on
+    keyset_fields = ('id', 'status', 'brand', 'product', 'target', 'fiscal_year', 'total_revenue', 'approved')
+
     buttons = tables.TemplateColumn(
         template_name="portfolio_planner/opportunity/partials/buttons.html",
         verbose_name=_("Actions"),
@@ -15,7 +27,7 @@ class OpportunityTable(tables.Table):
 
     class Meta:
         model = Opportunity
-        template_name = "django_tables2/bootstrap5-responsive.html"
+        template_name = "tables/keyset_bootstrap5-responsive.html"
 
         fields = (
             'id',
@@ -38,9 +50,22 @@ class OpportunityTable(tables.Table):
         }
 
 
-class OpportunityApprovalsTable(tables.Table):
+class OpportunityApprovalsTable(TotalRevenueMixin, tables.Table):
     """Opportunity Approvals Table."""
 
+    # Columns that are never NULL, which KeysetPaginator can seek on
+    keyset_fields = (
+        'id',
+        'brand__user__first_name',
+        'brand__user__last_name',
+        'status',
+        'brand',
+        'product',
+        'target',
+        'total_revenue',
+        'approved',
+    )
+
     buttons = tables.TemplateColumn(
         template_name="home/partials/approvals_buttons.html",
         verbose_name=_("Actions"),
@@ -49,7 +74,7 @@ class OpportunityApprovalsTable(tables.Table):
 
     class Meta:
         model = Opportunity
-        template_name = "django_tables2/bootstrap5-responsive.html"
+        template_name = "tables/keyset_bootstrap5-responsive.html"
 
         fields = (
             'id',
@@ -70,4 +95,4 @@ class OpportunityApprovalsTable(tables.Table):
             'thead': {
                 'class': 'thead-light'
             }
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,202 @@
+"""Keyset pagination for django_tables2 tables."""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from datetime import date
+
+from django.db import connection
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+from django_tables2.rows import BoundRows
+from djmoney.money import Money
+
+
+def encode_cursor(data: dict) -> str:
+    """Encode a cursor as an opaque URL-safe string."""
+    def default(value):
+        if isinstance(value, date):
+            return value.isoformat()
+        if isinstance(value, Money):
+            return str(value.amount)
+        return str(value)  # Decimals
+
+    return urlsafe_b64encode(json.dumps(data, default=default).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Decode a cursor, returning an empty dictionary if it is missing or invalid."""
+    if not cursor:
+        return {}
+
+    try:
+        data = json.loads(urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (BinasciiError, UnicodeDecodeError, ValueError):
+        return {}
+
+    return data if isinstance(data, dict) else {}
+
+
+class KeysetPage:
+    """A page of table rows from a KeysetPaginator.
+
+    Provides the parts of django.core.paginator.Page that the table templates use, with cursors instead of page
+    numbers.
+    """
+
+    def __init__(self, object_list, paginator, previous_cursor: str = None, next_cursor: str = None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.previous_cursor = previous_cursor
+        self.next_cursor = next_cursor
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        return self.has_previous() or self.has_next()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """Paginates table rows by seeking past the rows already shown, rather than with OFFSET.
+
+    A page is fetched by filtering on the ordering columns of the last row of the previous page (or the first row of
+    the next page, going backwards), with the primary key added to make the order total. Deep pages then cost the same
+    as the first one. Only the columns in `keyset_fields` are used this way; ordering by any other column, such as a
+    nullable one, falls back to OFFSET paging addressed by the same cursors. The fields default to the table's
+    `keyset_fields` attribute.
+
+    Use it through the table's paginate options, passing the cursor from the request:
+
+        RequestConfig(request, paginate={'paginator_class': KeysetPaginator, 'cursor': request.GET.get('cursor')})
+
+    The total is the database's row estimate for the query unless `exact_count` is set, which saves a full COUNT(*).
+    """
+
+    def __init__(self, object_list, per_page: int, cursor: str = None, keyset_fields=None, exact_count: bool = False,
+                 **kwargs):
+        self.rows = object_list
+        self.per_page = int(per_page)
+        self.cursor = decode_cursor(cursor)
+        if keyset_fields is None:
+            keyset_fields = getattr(object_list.table, 'keyset_fields', ())
+        self.keyset_fields = set(keyset_fields) | {'id', 'pk'}
+        self.exact_count = exact_count or connection.vendor != 'postgresql'
+
+    @property
+    def queryset(self):
+        return self.rows.data.data
+
+    @cached_property
+    def count(self) -> int:
+        """The number of rows, estimated by the query planner unless `exact_count` is set."""
+        if self.exact_count:
+            return self.queryset.count()
+
+        plan = json.loads(self.queryset.explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    @property
+    def count_is_exact(self) -> bool:
+        return self.exact_count
+
+    def ordering(self) -> list:
+        """Get the ordering of the queryset, ending with the primary key so that it is total."""
+        ordering = list(self.queryset.query.order_by)
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            descending = ordering and ordering[-1].startswith('-')
+            ordering.append('-pk' if descending else 'pk')
+        return ordering
+
+    def page(self, number=None) -> KeysetPage:
+        """Get the page for the cursor. The page number django_tables2 passes in is ignored."""
+        ordering = self.ordering()
+
+        # A cursor from a different ordering, for example after a column header was clicked, starts from the top
+        cursor = self.cursor if self.cursor.get('k') == ordering else {}
+
+        if all(field.lstrip('-') in self.keyset_fields for field in ordering):
+            return self.keyset_page(ordering, cursor)
+        return self.offset_page(ordering, cursor)
+
+    def keyset_page(self, ordering: list, cursor: dict) -> KeysetPage:
+        keys = [field.lstrip('-') for field in ordering]
+        values = cursor.get('v')
+        backwards = cursor.get('d') == 'prev'
+
+        queryset = self.queryset.annotate(**{f'_keyset_{index}': F(key) for index, key in enumerate(keys)})
+        if values is not None and len(values) == len(keys):
+            queryset = queryset.filter(self.seek(ordering, values, backwards))
+        else:
+            values = None
+            backwards = False
+
+        if backwards:
+            queryset = queryset.order_by(*[field[1:] if field.startswith('-') else f'-{field}' for field in ordering])
+        else:
+            queryset = queryset.order_by(*ordering)
+
+        records = list(queryset[:self.per_page + 1])
+        more = len(records) > self.per_page
+        records = records[:self.per_page]
+        if backwards:
+            records.reverse()
+
+        def record_cursor(record, direction):
+            return encode_cursor({
+                'k': ordering,
+                'd': direction,
+                'v': [getattr(record, f'_keyset_{index}') for index in range(len(keys))],
+            })
+
+        has_previous = more if backwards else values is not None
+        has_next = True if backwards else more
+
+        return KeysetPage(
+            BoundRows(records, table=self.rows.table),
+            self,
+            previous_cursor=record_cursor(records[0], 'prev') if records and has_previous else None,
+            next_cursor=record_cursor(records[-1], 'next') if records and has_next else None,
+        )
+
+    @staticmethod
+    def seek(ordering: list, values: list, backwards: bool) -> Q:
+        """Build the filter for the rows after (or before) the row with the given ordering values.
+
+        For an ordering of (a, b, pk) going forwards, that is a > x OR (a = x AND b > y) OR (a = x AND b = y AND
+        pk > z), with the comparisons flipped for descending columns and when going backwards.
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            key = field.lstrip('-')
+            after = field.startswith('-') == backwards
+            condition |= equal & Q(**{f'{key}__gt' if after else f'{key}__lt': value})
+            equal &= Q(**{key: value})
+        return condition
+
+    def offset_page(self, ordering: list, cursor: dict) -> KeysetPage:
+        offset = cursor.get('o', 0)
+        if not isinstance(offset, int) or offset < 0:
+            offset = 0
+
+        records = list(self.queryset.order_by(*ordering)[offset:offset + self.per_page + 1])
+        more = len(records) > self.per_page
+
+        return KeysetPage(
+            BoundRows(records[:self.per_page], table=self.rows.table),
+            self,
+            previous_cursor=encode_cursor({
+                'k': ordering,
+                'o': max(offset - self.per_page, 0)
+            }) if offset else None,
+            next_cursor=encode_cursor({'k': ordering, 'o': offset + self.per_page}) if more else None,
+        )
@@ -0,0 +1,79 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rolepermissions.roles import assign_role
+
+from portfolio_planner.models import Brand
+from portfolio_planner.models import FiscalYear
+from portfolio_planner.models import Opportunity
+from portfolio_planner.models import OrgBusinessUnit
+from portfolio_planner.models import Product
+from portfolio_planner.models import User
+from sos.roles import AccountManager, BusinessUnitHead, SalesDirector
+
+
+class HomeOrLoginViewQueriesTest(TestCase):
+    """Pins the number of queries the home page runs for each role, however many brands and opportunities they see.
+
+    The budget is the session and user lookups, the fiscal calendar, the summary aggregate and the page of the approvals
+    table. Business Unit Heads and Sales Directors are also shown the approvals table, which checks their role and
+    estimates the number of rows. The role scope is cached by the first request.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        FiscalYear.objects.create(year=2025)
+        fiscal_year = FiscalYear.objects.create(year=2026, is_current=True)
+
+        cls.account_manager = User.objects.create_user(email='am@example.com', password='password')
+        cls.business_unit_head = User.objects.create_user(email='buh@example.com', password='password')
+        cls.sales_director = User.objects.create_user(email='sd@example.com', password='password')
+        assign_role(cls.account_manager, AccountManager)
+        assign_role(cls.business_unit_head, BusinessUnitHead)
+        assign_role(cls.sales_director, SalesDirector)
+
+        org_business_unit = OrgBusinessUnit.objects.create(
+            name='Business Unit',
+            business_unit_manager=cls.business_unit_head,
+        )
+        products = [Product.objects.create(name=f'Product {number}') for number in range(3)]
+
+        for number in range(5):
+            brand = Brand.objects.create(
+                name=f'Brand {number}',
+                user=cls.account_manager,
+                org_business_unit=org_business_unit,
+            )
+            for product in products:
+                Opportunity.objects.create(
+                    brand=brand,
+                    product=product,
+                    target=Decimal('1000.00'),
+                    fiscal_year=fiscal_year,
+                    approved=number % 2 == 0,
+                )
+
+    def setUp(self):
+        # Role scopes are cached by user ID, which the database may reuse between tests
+        cache.clear()
+
+    def assertHomeQueries(self, user, num: int):
+        self.client.force_login(user)
+        # The first request caches the role scope
+        self.assertEqual(self.client.get(reverse('home')).status_code, 200)
+
+        with self.assertNumQueries(num):
+            response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['opportunities_count'], 15)
+
+    def test_account_manager(self):
+        self.assertHomeQueries(self.account_manager, 6)
+
+    def test_business_unit_head(self):
+        self.assertHomeQueries(self.business_unit_head, 7)
+
+    def test_sales_director(self):
+        self.assertHomeQueries(self.sales_director, 7)
@@ -0,0 +1,129 @@
+from datetime import date
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from portfolio_planner.models import Brand
+from portfolio_planner.models import FiscalYear
+from portfolio_planner.models import Opportunity
+from portfolio_planner.models import OpportunityPerformance
+from portfolio_planner.models import OrgBusinessUnit
+from portfolio_planner.models import PeriodPerformance
+from portfolio_planner.models import Product
+from portfolio_planner.models import User
+
+
+@skipUnless(connection.vendor == 'postgresql', 'The query plans are PostgreSQL specific')
+class OpportunityIndexesTest(TestCase):
+    """Checks the planner uses the opportunity and performance period indexes for the filters they were added for.
+
+    The tables are small, so sequential scans are turned off for each test. The planner still has to choose between the
+    indexes, so each test shows the filter is served by its own index rather than just any index on the table.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.last_fiscal_year = FiscalYear.objects.create(year=2025)
+        cls.fiscal_year = FiscalYear.objects.create(year=2026, is_current=True)
+
+        # Bulk creates skip the signals, which are not needed to build the query plans
+        user = User.objects.create_user(email='am@example.com', password='password')
+        org_business_unit = OrgBusinessUnit.objects.bulk_create(
+            [OrgBusinessUnit(name='Business Unit', business_unit_manager=user)]
+        )[0]
+        cls.brands = Brand.objects.bulk_create([
+            Brand(name=f'Brand {number}', user=user, org_business_unit=org_business_unit) for number in range(20)
+        ])
+        products = Product.objects.bulk_create([Product(name=f'Product {number}') for number in range(25)])
+
+        # Most opportunities are closed and approved, as they are once a few fiscal years have been captured
+        opportunities = []
+        for fiscal_year in (cls.last_fiscal_year, cls.fiscal_year):
+            for brand in cls.brands:
+                for product in products:
+                    number = len(opportunities)
+                    status = {0: 'active', 1: 'won', 2: 'abandoned'}.get(number % 20, 'lost')
+                    closed = date(fiscal_year.year, number % 12 + 1, number % 28 + 1)
+                    opportunities.append(Opportunity(
+                        brand=brand,
+                        product=product,
+                        fiscal_year=fiscal_year,
+                        target=Decimal('1000.00'),
+                        status=status,
+                        won_date=closed if status == 'won' else None,
+                        lost_date=closed if status == 'lost' else None,
+                        abandoned_date=closed if status == 'abandoned' else None,
+                        approved=number % 20 != 3,
+                    ))
+        Opportunity.objects.bulk_create(opportunities)
+
+        performances = OpportunityPerformance.objects.bulk_create([
+            OpportunityPerformance(opportunity=opportunity, fiscal_year_id=opportunity.fiscal_year_id)
+            for opportunity in Opportunity.objects.all()
+        ])
+        PeriodPerformance.objects.bulk_create([
+            PeriodPerformance(
+                opportunity_performance=performance,
+                period=period,
+                revenue=Decimal('100.00'),
+                fiscal_year_id=performance.fiscal_year_id,
+            )
+            for performance in performances
+            for period in range(1, 13)
+        ])
+
+        with connection.cursor() as cursor:
+            for model in (Opportunity, PeriodPerformance):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+    def setUp(self):
+        # Only lasts until the test's transaction is rolled back
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, index_name: str):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, f'{index_name} is not used by the plan:\n{plan}')
+
+    def test_fiscal_year_status(self):
+        self.assertUsesIndex(
+            Opportunity.objects.filter(fiscal_year=self.fiscal_year, status__in=['active', 'won']),
+            'opp_fiscal_year_status_idx'
+        )
+
+    def test_brand_status(self):
+        self.assertUsesIndex(
+            Opportunity.objects.filter(brand=self.brands[0], status__in=['active', 'won']),
+            'opp_brand_status_idx'
+        )
+
+    def test_unapproved(self):
+        self.assertUsesIndex(
+            Opportunity.objects.filter(brand__in=self.brands[:5], approved=False),
+            'opp_unapproved_brand_idx'
+        )
+
+    def test_status_dates(self):
+        # The month windows the home page counts closed opportunities in
+        for field, index_name in (
+            ('won_date', 'opp_won_date_idx'),
+            ('lost_date', 'opp_lost_date_idx'),
+            ('abandoned_date', 'opp_abandoned_date_idx'),
+        ):
+            with self.subTest(field=field):
+                self.assertUsesIndex(
+                    Opportunity.objects.filter(**{
+                        f'{field}__gte': date(2026, 3, 1),
+                        f'{field}__lt': date(2026, 4, 1),
+                    }),
+                    index_name
+                )
+
+    def test_period_performance_fiscal_year(self):
+        performance = OpportunityPerformance.objects.filter(fiscal_year=self.fiscal_year).first()
+        self.assertUsesIndex(
+            PeriodPerformance.objects.filter(opportunity_performance=performance, fiscal_year=self.fiscal_year),
+            'periodperf_perf_fy_idx'
+        )
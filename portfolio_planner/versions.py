@@ -0,0 +1,60 @@
+"""Versions of cached data.
+
+Cached data is stored under keys that include the version of the data it was built from. Bumping the version when that
+data changes invalidates every entry at once. The versions are kept in the cache, so with a shared cache a change in one
+process is seen by all of them. With a per process cache, a change made by another process, such as another instance
+or a management command, is never seen, so data that is only invalidated by its version must not be cached there.
+"""
+from collections import namedtuple
+from uuid import uuid4
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils import timezone
+
+
+# The cached data that is versioned
+ROLE_SCOPES = 'role_scopes'
+FISCAL_CALENDAR = 'fiscal_calendar'
+DASHBOARD = 'dashboard'
+
+Version = namedtuple('Version', ['token', 'modified'])
+
+
+def is_cache_shared() -> bool:
+    """Whether the default cache is shared by every process, so a version bumped in one process is seen by all of them.
+
+    The memory and file based caches are local to a process or instance, and the dummy cache keeps nothing.
+    """
+    return not isinstance(caches['default'], (DummyCache, FileBasedCache, LocMemCache))
+
+
+def new_version() -> Version:
+    return Version(uuid4().hex, timezone.now().replace(microsecond=0))
+
+
+def get_version(name: str) -> Version:
+    """Get the current version of the named data."""
+    key = f'version:{name}'
+    version = cache.get(key)
+    if version is None:
+        version = new_version()
+        if not cache.add(key, version, None):
+            # Another process set the version first
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(name: str):
+    """Invalidate everything cached from the named data.
+
+    Inside a transaction, the version is bumped again once it commits, in case another process cached the data from
+    before the change in the meantime.
+    """
+    key = f'version:{name}'
+    cache.set(key, new_version(), None)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.set(key, new_version(), None))
@@ -1,11 +1,15 @@
 from datetime import datetime, timedelta
+from decimal import Decimal
 
 from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Count
 from django.db.models import Sum
 from django.shortcuts import render
 from django.http import HttpResponse
 from django.views.generic import TemplateView
+from django.utils import timezone
+from django.utils.safestring import mark_safe
 from django.utils.decorators import method_decorator
 from django.views.decorators.http import require_GET
 from django.contrib.auth.decorators import login_required
@@ -14,14 +18,22 @@ import simplejson as json
 
 from portfolio_planner.models import convert_to_money
 from portfolio_planner.models import Brand
-from portfolio_planner.models import FiscalYear
+from portfolio_planner.models import get_fiscal_calendar
 from portfolio_planner.models import Opportunity
 from portfolio_planner.tables import BrandTable
+from portfolio_planner.versions import DASHBOARD, get_version, is_cache_shared
 from .helpers.brands import get_brand_role_filters
+from .helpers.concurrency import AsyncQueriesMixin
+from .helpers.concurrency import QueriesMixin
+from .helpers.fragments import cached_fragment
+
+
+# The most brands any of the top brands options shows
+MAX_TOP_BRANDS = 10
 
 
 @method_decorator(login_required, name='dispatch')
-class DashboardView(TemplateView):
+class DashboardView(QueriesMixin, TemplateView):
     """Dashboard View.
 
     Provides a Dashboard based on Brand level data.
@@ -32,6 +44,7 @@ class DashboardView(TemplateView):
     It's not magic. If you don't update the dispatch method, HTMX just end up in a loop re-rendering the entire template.
     """
     template_name = 'dashboard/dashboard.html'
+    cached_actions = ('all', 'top_brands', 'grow_status', 'brand_table', 'opportunities_status')
 
     def dispatch(self, request, *args, **kwargs):
         """Dispatch requests to the appropriate method.
@@ -39,14 +52,34 @@ class DashboardView(TemplateView):
         Allows us to route the various HTMX requests to the appropriate method.
 
         Because the entire dashboard uses the same Brand roles based query, we can just use the same queryset for all.
+
+        The fragments built from the dashboard data are cached until the data changes. The time remaining only depends
+        on the date, so is not.
         """
 
         # Route the request to the appropriate method
         action = kwargs.get('action')
-        filters = get_brand_role_filters(request.user)
+        filters = get_brand_role_filters(request.role_scope)
         self.queryset = Brand.objects.filter(**filters)
 
-        if action == 'top_brands':
+        if action in self.cached_actions:
+            # The date is part of the name, as the combined response includes the time remaining
+            return cached_fragment(
+                request,
+                f'dashboard:{action}:{timezone.localdate()}',
+                DASHBOARD,
+                lambda: self.dispatch_action(request, action, *args, **kwargs)
+            )
+
+        return self.dispatch_action(request, action, *args, **kwargs)
+
+    def dispatch_action(self, request, action, *args, **kwargs):
+        """Run the method for the action."""
+        if action == 'all':
+            # Requires Data Preparation, once for every component
+            self.prepare_data(request)
+            return self.all_components(request, *args, **kwargs)
+        elif action == 'top_brands':
             # Requires Data Preparation
             self.prepare_data(request)
             return self.top_brands(request, *args, **kwargs)
@@ -55,90 +88,121 @@ class DashboardView(TemplateView):
             self.prepare_data(request)
             return self.grow_status(request, *args, **kwargs)
         elif action == 'brand_table':
-            # Requires Data Preparation
-            self.prepare_data(request)
+            # Only needs the per brand annotations, not the bucket totals
+            self.annotate_portfolio()
             return self.brand_table(request, *args, **kwargs)
         elif action == 'time_remaining':
             return self.time_remaining(request, *args, **kwargs)
         elif action == 'opportunities_status':
+            # Requires Data Preparation
+            self.prepare_data(request)
             return self.opportunities_status(request, *args, **kwargs)
 
         # Just run this function if we don't have an action. This renders the base template for the dashboard
         return super().dispatch(request, *args, **kwargs)
 
+    def annotate_portfolio(self):
+        """Annotate the role based Brands query with its portfolio data.
+
+        Reads each brand's target, last fiscal revenue and G.R.O.W. bucket for the current fiscal year from the brand
+        portfolio snapshot. These are kept up to date by signals, so we don't have to aggregate the history here. The
+        queryset is not evaluated, so it can still be filtered, sorted and paginated in the database.
+        """
+        self.current_fiscal_year = get_fiscal_calendar().current
+        self.queryset = self.queryset.with_portfolio_snapshot(fiscal_year=self.current_fiscal_year)
+
     def prepare_data(self, request):
+        """Prepare the data shared by the dashboard components.
+
+        The bucket totals, the top brands and the opportunity status counts are cached for the user's role scope until
+        the dashboard data changes, so changing a single component's filter does not recompute them. They are only
+        cached when the cache is shared, as otherwise changes made by other processes would not invalidate them.
+        """
         # Perform the role based Brands query
-        # Next, figure out the details we need allocate the brand into one of the G.R.O.W. buckets
-        self.sum_target_values = Opportunity.objects.filter(brand__in=self.queryset).aggregate(
-            total_target=Sum('target')
-        )
-        # Get current fiscal year so that we can get all the opportunities for the previous fiscal year
-        self.current_fiscal_year = FiscalYear.objects.get(is_current=True)
-        self.last_fiscal_year = FiscalYear.objects.get(year=self.current_fiscal_year.year - 1)
-        all_revenue_last_fiscal = Opportunity.objects.filter(status__in=['active', 'won']).with_revenue(
-            fiscal_year=self.last_fiscal_year).aggregate(_revenue_last_fiscal=Sum('total_revenue'))[
-            '_revenue_last_fiscal']
-        # Set some default values for the G.R.O.W. buckets. We will add to these in the brand loop below
-        self.game_changer_target = convert_to_money(0)
-        self.real_opportunity_target = convert_to_money(0)
-        self.open_target = convert_to_money(0)
-        self.wish_target = convert_to_money(0)
-        self.game_changer_revenue_last_fiscal = convert_to_money(0)
-        self.real_opportunity_revenue_last_fiscal = convert_to_money(0)
-        self.open_revenue_last_fiscal = convert_to_money(0)
-        self.wish_revenue_last_fiscal = convert_to_money(0)
-        # Loop through the opportunities and figure out if they are in a G.R.O.W. bucket
-        for brand in self.queryset:
-            # Get the sum target for all brand opportunities
-            target = Opportunity.objects.filter(brand=brand).aggregate(total_target=Sum('target'))['total_target']
-
-            # Get the revenue for all brand opportunities in the previous fiscal year
-            # Note, total revenue needs to be annotated on the queryset so that we can use it in the aggregate
-            revenue_last_fiscal = Opportunity.objects.filter(brand=brand, status__in=['active', 'won']).with_revenue(
-                fiscal_year=self.last_fiscal_year).aggregate(_revenue_last_fiscal=Sum('total_revenue'))[
-                '_revenue_last_fiscal']
-
-            # Guard for revenue_last_fiscal being None
-            revenue_last_fiscal = 0 if revenue_last_fiscal is None else revenue_last_fiscal
-
-            if target is not None and all_revenue_last_fiscal != 0 and target / all_revenue_last_fiscal >= 0.3:
-                brand.grow_bucket = 'Game Changer'
-                self.game_changer_target += convert_to_money(target)
-                self.game_changer_revenue_last_fiscal += convert_to_money(revenue_last_fiscal)
-            elif target is not None and revenue_last_fiscal != 0 and (
-                    target - revenue_last_fiscal) / revenue_last_fiscal >= 0.1:
-                brand.grow_bucket = 'Real Opportunity'
-                self.real_opportunity_target += convert_to_money(target)
-                self.real_opportunity_revenue_last_fiscal += convert_to_money(revenue_last_fiscal)
-            elif revenue_last_fiscal is not None and revenue_last_fiscal > 0:
-                brand.grow_bucket = 'Open'
-                self.open_target += convert_to_money(target)
-                self.open_revenue_last_fiscal += convert_to_money(revenue_last_fiscal)
-            else:
-                brand.grow_bucket = 'Wish'
-                # Check for None values and set to 0
-                if target is None:
-                    target = 0
-                self.wish_target += convert_to_money(target)
-                self.wish_revenue_last_fiscal += convert_to_money(revenue_last_fiscal)
-
-            # Now append the financial data to the brand
-            brand.total_target = convert_to_money(target) if target is not None else convert_to_money(0)
-            brand.total_revenue_last_fiscal = convert_to_money(
-                revenue_last_fiscal) if revenue_last_fiscal is not None else convert_to_money(0)
+        self.annotate_portfolio()
+
+        key = f'dashboard:data:{request.role_scope.fingerprint}:{get_version(DASHBOARD).token}'
+        data = cache.get(key) if is_cache_shared() else None
+        if data is None:
+            # The queries are independent, so the async view runs them concurrently
+            bucket_totals, top_brands, status_counts = self.run_queries(
+                # Total the G.R.O.W. buckets with a single grouped aggregate
+                lambda: {
+                    row['grow_bucket']: row for row in self.queryset.order_by().values('grow_bucket').annotate(
+                        bucket_target=Sum('total_target'),
+                        bucket_revenue_last_fiscal=Sum('total_revenue_last_fiscal'),
+                    )
+                },
+                # Enough of the brands with the largest target for any of the top brands options
+                lambda: list(
+                    self.queryset.order_by('-total_target', 'pk').values('name', 'total_target')[:MAX_TOP_BRANDS]
+                ),
+                # Count the opportunities in each status
+                lambda: list(
+                    Opportunity.objects.filter(
+                        brand__in=self.queryset.values('pk')
+                    ).values('status').annotate(count=Count('status')).order_by()
+                ),
+            )
+            data = {'bucket_totals': bucket_totals, 'top_brands': top_brands, 'status_counts': status_counts}
+            if is_cache_shared():
+                cache.set(key, data, settings.FRAGMENT_CACHE_TIMEOUT)
+
+        bucket_totals = data['bucket_totals']
+        self.top_brand_targets = data['top_brands']
+        self.status_counts = data['status_counts']
+
+        def bucket_total(bucket: str, field: str):
+            return convert_to_money(bucket_totals.get(bucket, {}).get(field) or 0)
+
+        self.game_changer_target = bucket_total('Game Changer', 'bucket_target')
+        self.real_opportunity_target = bucket_total('Real Opportunity', 'bucket_target')
+        self.open_target = bucket_total('Open', 'bucket_target')
+        self.wish_target = bucket_total('Wish', 'bucket_target')
+        self.game_changer_revenue_last_fiscal = bucket_total('Game Changer', 'bucket_revenue_last_fiscal')
+        self.real_opportunity_revenue_last_fiscal = bucket_total('Real Opportunity', 'bucket_revenue_last_fiscal')
+        self.open_revenue_last_fiscal = bucket_total('Open', 'bucket_revenue_last_fiscal')
+        self.wish_revenue_last_fiscal = bucket_total('Wish', 'bucket_revenue_last_fiscal')
+
+        # Every brand lands in exactly one bucket, so the bucket targets add up to the target across all brands
+        self.sum_target_values = {
+            'total_target': sum((row['bucket_target'] or 0 for row in bucket_totals.values()), Decimal('0.00'))
+        }
+
+    @method_decorator(require_GET)
+    def all_components(self, request, *args, **kwargs) -> HttpResponse:
+        """All the dashboard components in one response.
+
+        Each component is swapped into its container out of band, so the dashboard loads with a single request that
+        prepares the data once.
+        """
+        components = [
+            ('top-brands-budget-chart-container', self.top_brands),
+            ('grow-status-chart-container', self.grow_status),
+            ('time-remaining-chart-container', self.time_remaining),
+            ('opportunities-chart-container', self.opportunities_status),
+            ('brand-table-container', self.brand_table),
+        ]
+
+        context = {
+            'components': [
+                (container_id, mark_safe(component(request, *args, **kwargs).content.decode()))
+                for container_id, component in components
+            ],
+        }
+
+        return render(request, 'dashboard/components/all.html', context)
 
     @method_decorator(require_GET)
     def top_brands(self, request, *args, **kwargs) -> HttpResponse:
         # Get the number of brands to display from the request, default to 5
         number_brands = int(request.GET.get('number', 5))
 
-        # Calculate the sum of target values for opportunities per brand
-        brand_targets = (
-            Opportunity.objects.filter(brand__in=self.queryset)
-            .values('brand__name')  # Assuming the brand has a 'name' field to display
-            .annotate(total_target=Sum('target'))
-            .order_by('-total_target')[:number_brands]
-        )
+        # Get the brands with the largest target from the snapshot
+        if number_brands <= MAX_TOP_BRANDS:
+            brand_targets = self.top_brand_targets[:number_brands]
+        else:
+            brand_targets = self.queryset.order_by('-total_target', 'pk').values('name', 'total_target')[:number_brands]
 
         # Get the total for the top 'n' brands
         top_brands_total = sum(item['total_target'] for item in brand_targets)
@@ -147,7 +211,7 @@ class DashboardView(TemplateView):
         other_total = self.sum_target_values['total_target'] - top_brands_total
 
         # Prepare the data for the pie chart
-        labels = [item['brand__name'] for item in brand_targets] + ['Other']
+        labels = [item['name'] for item in brand_targets] + ['Other']
         data = [item['total_target'] for item in brand_targets] + [other_total]
 
         context = {
@@ -235,8 +299,9 @@ class DashboardView(TemplateView):
     def brand_table(self, request, *args, **kwargs) -> HttpResponse:
         """Brand Table."""
 
-        # Initialize the table with the queryset
-        table = BrandTable(self.queryset)
+        # Initialize the table with the queryset. The portfolio columns are annotations, so sorting and pagination
+        # happen in the database and only the page of brands shown is fetched.
+        table = BrandTable(self.queryset.select_related('user', 'agency', 'org_business_unit'))
 
         # Apply sorting
         RequestConfig(request, paginate={'per_page': 20}).configure(table)
@@ -299,8 +364,7 @@ class DashboardView(TemplateView):
     @method_decorator(require_GET)
     def opportunities_status(self, request, *args, **kwargs) -> HttpResponse:
         """Opportunities Status Chart."""
-        queryset = Opportunity.objects.filter(brand__in=self.queryset)
-        status_counts = queryset.values('status').annotate(count=Count('status')).order_by()
+        status_counts = self.status_counts
 
         # Prepare data for the pie chart
         labels = [status['status'] for status in status_counts]
@@ -313,3 +377,10 @@ class DashboardView(TemplateView):
         }
 
         return render(request, 'dashboard/components/opportunities_status.html', context)
+
+
+class AsyncDashboardView(AsyncQueriesMixin, DashboardView):
+    """Async Dashboard View.
+
+    Runs the queries behind the dashboard components concurrently. Served instead of DashboardView under ASGI.
+    """
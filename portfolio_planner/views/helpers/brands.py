@@ -1,22 +1,15 @@
+from portfolio_planner.scopes import RoleScope
 
-from rolepermissions.checkers import has_role
 
-from portfolio_planner.models import Brand
-from portfolio_planner.models import User
-from sos.roles import AccountManager, BusinessUnitHead, SalesDirector
-
-
-def get_brand_role_filters(user: User) -> dict:
-    """Sets the correct brand filters based on the users role."""
+def get_brand_role_filters(scope: RoleScope) -> dict:
+    """Sets the correct brand filters based on the users role scope, usually `request.role_scope`."""
     filters = {
         'status': 'active'
     }
 
-    if has_role(user, AccountManager):
-        filters['user'] = user
-    elif has_role(user, BusinessUnitHead):
-        filters['org_business_unit__business_unit_manager'] = user
-    elif has_role(user, SalesDirector):
-        pass  # No extra filter for SalesDirector, they see all opportunities
+    # Account Managers see their own brands and Business Unit Heads the brands of their business units. There is no
+    # extra filter for Sales Directors, they see all brands.
+    if scope.brand_ids is not None:
+        filters['pk__in'] = scope.brand_ids
 
     return filters
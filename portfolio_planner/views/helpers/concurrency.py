@@ -0,0 +1,65 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+
+# Bounds how many queries the async views run at once in each process. Each thread has its own database connection.
+query_executor = ThreadPoolExecutor(max_workers=settings.ASYNC_QUERY_WORKERS, thread_name_prefix='query')
+
+
+def managing_connections(query):
+    """Wrap a query so the thread's database connections are managed as they would be for a request.
+
+    The pool threads are not tied to a request, so Django never closes their connections itself. Connections that are
+    broken or older than CONN_MAX_AGE are closed before and after the query, and the rest are kept open for the thread's
+    next query, rather than paying for a new connection every time.
+    """
+    def run():
+        close_old_connections()
+        try:
+            return query()
+        finally:
+            close_old_connections()
+
+    return run
+
+
+async def gather_queries(*queries) -> list:
+    """Run the queries concurrently on the query thread pool, returning their results in order."""
+    return await asyncio.gather(*(
+        sync_to_async(managing_connections(query), thread_sensitive=False, executor=query_executor)()
+        for query in queries
+    ))
+
+
+class QueriesMixin:
+    """Lets a view run independent queries through `run_queries`, which its async variant runs concurrently.
+
+    Each query is a callable taking no arguments. The results are returned in order.
+    """
+
+    def run_queries(self, *queries) -> list:
+        return [query() for query in queries]
+
+
+class AsyncQueriesMixin(QueriesMixin):
+    """Makes a view that uses QueriesMixin async.
+
+    The sync view runs in a thread, off the event loop, with the queries it passes to `run_queries` running concurrently
+    on the bounded query thread pool. The view's latency is then set by its slowest query rather than the sum of them.
+    Must come before the view class.
+    """
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        response = await sync_to_async(super().dispatch)(request, *args, **kwargs)
+        if asyncio.iscoroutine(response):
+            # Django's own handlers, such as http_method_not_allowed, return coroutines for async views
+            response = await response
+        return response
+
+    def run_queries(self, *queries) -> list:
+        return async_to_sync(gather_queries)(*queries)
@@ -0,0 +1,10 @@
+from portfolio_planner.models import get_fiscal_calendar
+
+
+def get_current_and_last_fiscal_year() -> tuple:
+    """Get the current and last fiscal years from the cached fiscal calendar.
+
+    Raises FiscalYear.DoesNotExist if either of them is missing.
+    """
+    calendar = get_fiscal_calendar()
+    return calendar.current, calendar.previous
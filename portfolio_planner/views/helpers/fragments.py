@@ -0,0 +1,49 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from portfolio_planner.versions import get_version, is_cache_shared
+
+
+def cached_fragment(request: HttpRequest, name: str, data: str, render) -> HttpResponse:
+    """Serve an HTMX fragment from the cache, calling `render` to render it when it is not cached.
+
+    A fragment is keyed by its name, the user's role scope, the query parameters and the version of the data it is built
+    from (see portfolio_planner.versions). The key is also its ETag and the version its Last-Modified, so a browser
+    revalidating a fragment it already has gets a 304 without the cache even being read. Only successful GET responses
+    are cached.
+
+    Unless the cache is shared, a version bumped by another process is never seen, so the fragment is rendered every
+    time, without an ETag.
+    """
+    if request.method not in ('GET', 'HEAD') or not is_cache_shared():
+        return render()
+
+    version = get_version(data)
+    params = sorted(request.GET.lists())
+    etag = md5(f'{name}:{request.role_scope.fingerprint}:{params}:{version.token}'.encode()).hexdigest()
+    last_modified = int(version.modified.timestamp())
+
+    response = get_conditional_response(request, etag=f'"{etag}"', last_modified=last_modified)
+    if response is None:
+        key = f'fragment:{etag}'
+        cached = cache.get(key)
+        if cached is None:
+            response = render()
+            if response.status_code != 200:
+                return response
+            cache.set(key, (response.content, response['Content-Type']), settings.FRAGMENT_CACHE_TIMEOUT)
+        else:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+
+    # The fragments are per user, so may only be cached by the browser, which must check they are still current
+    response['ETag'] = f'"{etag}"'
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -1,58 +1,48 @@
-from django.conf import settings
 from django.db.models import QuerySet
 from django.db.models import Sum
-from rolepermissions.checkers import has_role
 
-from portfolio_planner.models import convert_to_money
-from portfolio_planner.models import FiscalYear
 from portfolio_planner.models import Opportunity
-from sos.roles import AccountManager, BusinessUnitHead, SalesDirector
+from portfolio_planner.scopes import RoleScope
+from .fiscal_years import get_current_and_last_fiscal_year
 
 
-def role_based_opportunities(user: settings.AUTH_USER_MODEL) -> QuerySet:
+def role_based_opportunities(scope: RoleScope) -> QuerySet:
     """
-    Return Opportunities queryset based on Role.
+    Return Opportunities queryset based on the users role scope, usually `request.role_scope`.
 
     Account Managers can only see their owned opportunities.
     Business Unit Heads can see all opportunities owned by their business unit.
     Sales Directors can see all opportunities.
 
-    Includes revenue data for the previous fiscal year.
+    Includes revenue data for the previous fiscal year. The queryset is not evaluated.
     """
 
     # We want revenue from the previous fiscal year
-    current_fiscal_year = FiscalYear.objects.get(is_current=True)
-    last_fiscal_year = FiscalYear.objects.get(year=current_fiscal_year.year - 1)
+    current_fiscal_year, last_fiscal_year = get_current_and_last_fiscal_year()
 
     filters = {
         'status__in': ['active', 'won'],
         'fiscal_year': current_fiscal_year
     }
 
-    if has_role(user, AccountManager):
-        filters['brand__user'] = user
-    elif has_role(user, BusinessUnitHead):
-        filters['brand__org_business_unit__business_unit_manager'] = user
-    elif has_role(user, SalesDirector):
-        pass  # No extra filter for SalesDirector, they see all opportunities
-    else:
+    if scope.role is None:
         return Opportunity.objects.none()  # If none of the roles apply, return no data
 
-    queryset = Opportunity.objects.filter(**filters).with_revenue(last_fiscal_year).with_agency()
+    if scope.brand_ids is not None:
+        filters['brand_id__in'] = scope.brand_ids  # No extra filter for SalesDirector, they see all opportunities
 
-    # Convert revenue to Money object
-    # For some reason, we cannot get the queryset to return a Money type object. So we are converting it here.
-    for opp in queryset:
-        opp.total_revenue = convert_to_money(opp.total_revenue)
-
-    return queryset
+    # The queryset is returned unevaluated, so callers only fetch what they use. The revenue annotations are plain
+    # decimals, and are converted to Money by the table columns when they are rendered.
+    return Opportunity.objects.filter(**filters).with_revenue(last_fiscal_year).with_agency().select_related(
+        'product',
+        'fiscal_year',
+    )
 
 
 def categorise_opportunities(opportunities: QuerySet) -> QuerySet:
     # TODO: This is supposed to be at the brand level, not the opportunity level
     #   Leaving this here for short term reference.
-    current_fiscal_year = FiscalYear.objects.get(is_current=True)
-    last_fiscal_year = FiscalYear.objects.get(year=current_fiscal_year.year - 1)
+    current_fiscal_year, last_fiscal_year = get_current_and_last_fiscal_year()
 
     all_open_opportunities = Opportunity.objects.filter(
         status__in=['active', 'won', 'lost'], fiscal_year=current_fiscal_year
@@ -1,8 +1,10 @@
+from datetime import timedelta
+
 from django.contrib.auth.mixins import UserPassesTestMixin
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 from django.utils.decorators import method_decorator
-from django.db.models import Sum
+from django.db.models import Count, DecimalField, FilteredRelation, Q, Sum
 from django_tables2 import RequestConfig
 from django.urls import reverse_lazy
 from django.utils import timezone
@@ -11,14 +13,17 @@ from django.views.generic import TemplateView
 
 from portfolio_planner.models import Brand
 from portfolio_planner.models import convert_to_money
-from portfolio_planner.models import FiscalYear
 from portfolio_planner.models import Opportunity
 from portfolio_planner.tables.opportunity import OpportunityApprovalsTable
+from portfolio_planner.tables.pagination import KeysetPaginator
 from .helpers.brands import get_brand_role_filters
+from .helpers.concurrency import AsyncQueriesMixin
+from .helpers.concurrency import QueriesMixin
+from .helpers.fiscal_years import get_current_and_last_fiscal_year
 from .helpers.opportunities import role_based_opportunities
 
 
-class HomeOrLoginView(UserPassesTestMixin, TemplateView):
+class HomeOrLoginView(QueriesMixin, UserPassesTestMixin, TemplateView):
     template_name = 'home/home.html'
     login_url = reverse_lazy('login')  # Redirect to login page if user fails the test function
 
@@ -26,72 +31,93 @@ class HomeOrLoginView(UserPassesTestMixin, TemplateView):
         context = super().get_context_data(**kwargs)
 
         # Set brand filters based on users current role
-        filters = get_brand_role_filters(self.request.user)
+        filters = get_brand_role_filters(self.request.role_scope)
 
         # Figure out the fiscals
-        current_fiscal_year = FiscalYear.objects.get(is_current=True)
-        last_fiscal_year = FiscalYear.objects.get(year=current_fiscal_year.year - 1)
+        current_fiscal_year, last_fiscal_year = get_current_and_last_fiscal_year()
         context['current_fiscal_year'] = current_fiscal_year
         context['last_fiscal_year'] = last_fiscal_year
 
         # Get the brands
         brands = Brand.objects.filter(**filters)
 
-        # Count opportunities
-        context['opportunities_count'] = Opportunity.objects.filter(brand__in=brands).count()
-        context['opportunities_sum'] = convert_to_money(Opportunity.objects.filter(brand__in=brands).aggregate(Sum('target'))['target__sum'])
-
-        # Calculate revenue
-        context['revenue_last_fiscal'] = convert_to_money(Opportunity.objects.filter(status__in=['active', 'won']).with_revenue(
-            fiscal_year=last_fiscal_year).aggregate(_revenue_last_fiscal=Sum('total_revenue'))[
-            '_revenue_last_fiscal'])
-
-        context['revenue_this_fiscal'] = convert_to_money(Opportunity.objects.filter(status__in=['active', 'won']).with_revenue(
-            fiscal_year=current_fiscal_year).aggregate(_revenue_this_fiscal=Sum('total_revenue'))[
-            '_revenue_this_fiscal'])
-
-        # Count closed opportunities
-        current_date = timezone.now().date()
-
-        context['won_this_month_count'] = Opportunity.objects.filter(
-            brand__in=brands,
-            won_date__year=current_date.year,
-            won_date__month=current_date.month,
-        ).count()
-
-        context['lost_this_month_count'] = Opportunity.objects.filter(
-            brand__in=brands,
-            lost_date__year=current_date.year,
-            lost_date__month=current_date.month,
-        ).count()
-
-        context['abandoned_this_month_count'] = Opportunity.objects.filter(
-            brand__in=brands,
-            abandoned_date__year=current_date.year,
-            abandoned_date__month=current_date.month,
-        ).count()
-
-        # Get the approvals values and counts
-        context['unapproved_count'] = Opportunity.objects.filter(brand__in=brands, approved=False).count()
-        context['approved_count'] = Opportunity.objects.filter(brand__in=brands, approved=True).count()
-        context['approved_sum'] = convert_to_money(Opportunity.objects.filter(brand__in=brands, approved=True).aggregate(Sum('target'))['target__sum'])
-        context['unapproved_sum'] = convert_to_money(Opportunity.objects.filter(brand__in=brands, approved=False).aggregate(Sum('target'))['target__sum'])
+        # Calculate all the summary figures for the role's brands in one query. Each opportunity has at most one revenue
+        # rollup per fiscal year, so joining both fiscal years does not multiply the opportunity rows.
+        # The month is a half open date range rather than a year and month lookup, so the date indexes can be used
+        month_start = timezone.now().date().replace(day=1)
+        next_month_start = (month_start + timedelta(days=32)).replace(day=1)
+        decimal_field = DecimalField(max_digits=14, decimal_places=2)
+        revenue_statuses = Q(status__in=['active', 'won'])
+
+        def summarise():
+            return Opportunity.objects.filter(brand__in=brands).annotate(
+                last_fiscal_rollup=FilteredRelation(
+                    'revenue_rollups',
+                    condition=Q(revenue_rollups__fiscal_year=last_fiscal_year)
+                ),
+                this_fiscal_rollup=FilteredRelation(
+                    'revenue_rollups',
+                    condition=Q(revenue_rollups__fiscal_year=current_fiscal_year)
+                ),
+            ).aggregate(
+                # Count opportunities
+                opportunities_count=Count('id'),
+                opportunities_sum=Sum('target', output_field=decimal_field),
+                # Calculate revenue
+                revenue_last_fiscal=Sum('last_fiscal_rollup__total_revenue', filter=revenue_statuses),
+                revenue_this_fiscal=Sum('this_fiscal_rollup__total_revenue', filter=revenue_statuses),
+                # Count closed opportunities
+                won_this_month_count=Count('id', filter=Q(
+                    won_date__gte=month_start,
+                    won_date__lt=next_month_start,
+                )),
+                lost_this_month_count=Count('id', filter=Q(
+                    lost_date__gte=month_start,
+                    lost_date__lt=next_month_start,
+                )),
+                abandoned_this_month_count=Count('id', filter=Q(
+                    abandoned_date__gte=month_start,
+                    abandoned_date__lt=next_month_start,
+                )),
+                # Get the approvals values and counts
+                unapproved_count=Count('id', filter=Q(approved=False)),
+                approved_count=Count('id', filter=Q(approved=True)),
+                approved_sum=Sum('target', filter=Q(approved=True), output_field=decimal_field),
+                unapproved_sum=Sum('target', filter=Q(approved=False), output_field=decimal_field),
+            )
 
         # Render the approvals table
-        tables_opps = Opportunity.objects.filter(brand__in=brands).with_revenue(last_fiscal_year).with_agency()
-        for opp in tables_opps:
-            opp.total_revenue = convert_to_money(opp.total_revenue)
+        tables_opps = Opportunity.objects.filter(
+            brand__in=brands
+        ).with_revenue(last_fiscal_year).with_agency().select_related('brand__user', 'product')
 
         table = OpportunityApprovalsTable(tables_opps)
 
-        # Apply sorting
-        RequestConfig(self.request, paginate={'per_page': 20}).configure(table)
+        # Apply sorting, which fetches the page of the table
+        def paginate():
+            RequestConfig(self.request, paginate={
+                'paginator_class': KeysetPaginator,
+                'per_page': 20,
+                'cursor': self.request.GET.get('cursor'),
+            }).configure(table)
+
+        # The summary and the table page are independent, so the async view runs them concurrently
+        summary, _ = self.run_queries(summarise, paginate)
+
+        for key in ('opportunities_sum', 'revenue_last_fiscal', 'revenue_this_fiscal', 'approved_sum', 'unapproved_sum'):
+            summary[key] = convert_to_money(summary[key])
+        context.update(summary)
         context['table'] = table
 
         # Return context to the template
-        from rolepermissions.roles import get_user_roles
-        print(get_user_roles(self.request.user))
         return context
 
     def test_func(self):
         return self.request.user.is_authenticated
+
+
+class AsyncHomeOrLoginView(AsyncQueriesMixin, HomeOrLoginView):
+    """Async Home View.
+
+    Runs the summary figures and the approvals table queries concurrently. Served instead of HomeOrLoginView under ASGI.
+    """
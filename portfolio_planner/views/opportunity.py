@@ -1,6 +1,6 @@
 import json
 
-from django.db.models import Sum, Avg
+from django.db.models import Avg, Count, DecimalField, Sum
 from django.http import HttpResponse
 from django.views.decorators.http import require_POST, require_GET
 from django.views.decorators.http import require_http_methods
@@ -9,7 +9,6 @@ from django.shortcuts import render
 from django.utils.decorators import method_decorator
 from django.contrib.auth.decorators import login_required
 from django_tables2 import SingleTableView
-from rolepermissions.checkers import has_role
 
 from .helpers.opportunities import role_based_opportunities
 from portfolio_planner.models import Brand
@@ -20,6 +19,7 @@ from portfolio_planner.models import convert_to_money
 from portfolio_planner.common import HtmxHttpRequest
 from portfolio_planner.forms import OpportunityForm
 from portfolio_planner.tables import OpportunityTable
+from portfolio_planner.tables.pagination import KeysetPaginator
 
 
 @method_decorator(login_required, name='dispatch')
@@ -36,15 +36,22 @@ class PortfolioPlannerView(TemplateView):
         context = super().get_context_data(**kwargs)
         context['current_params'] = self.request.GET.urlencode()
 
-        # Let's calculate some summary stats for the portfolio planner
-
-        opportunities = role_based_opportunities(self.request.user)
-
-        context['total_forecasted_revenue'] = convert_to_money(opportunities.aggregate(Sum('target'))['target__sum'])
-        context['total_revenue_last_fiscal'] = convert_to_money(opportunities.aggregate(Sum('total_revenue'))['total_revenue__sum'])
-        context['deal_count'] = opportunities.count()
-        context['avg_deal_size'] = convert_to_money(opportunities.aggregate(Avg('target'))['target__avg'])
-        context['avg_deal_last_fiscal'] = convert_to_money(opportunities.aggregate(Avg('total_revenue'))['total_revenue__avg'])
+        # Let's calculate some summary stats for the portfolio planner, all in a single query
+        opportunities = role_based_opportunities(self.request.role_scope)
+        decimal_field = DecimalField(max_digits=14, decimal_places=2)
+        summary = opportunities.aggregate(
+            total_forecasted_revenue=Sum('target', output_field=decimal_field),
+            total_revenue_last_fiscal=Sum('total_revenue'),
+            deal_count=Count('id'),
+            avg_deal_size=Avg('target', output_field=decimal_field),
+            avg_deal_last_fiscal=Avg('total_revenue'),
+        )
+
+        context['total_forecasted_revenue'] = convert_to_money(summary['total_forecasted_revenue'])
+        context['total_revenue_last_fiscal'] = convert_to_money(summary['total_revenue_last_fiscal'])
+        context['deal_count'] = summary['deal_count']
+        context['avg_deal_size'] = convert_to_money(summary['avg_deal_size'])
+        context['avg_deal_last_fiscal'] = convert_to_money(summary['avg_deal_last_fiscal'])
 
         return context
 
@@ -61,7 +68,18 @@ class OpportunityListView(SingleTableView):
 
         Using helper function, return Opportunities queryset based on Role.
         """
-        return role_based_opportunities(self.request.user)
+        return role_based_opportunities(self.request.role_scope)
+
+    def get_table_pagination(self, table):
+        """Get Table Pagination.
+
+        Pages through the opportunities with keyset pagination, so deep pages and the total do not need to scan the
+        whole annotated queryset.
+        """
+        return {
+            'paginator_class': KeysetPaginator,
+            'cursor': self.request.GET.get('cursor'),
+        }
 
 
 @login_required
@@ -0,0 +1,150 @@
+"""Middleware for the sos project."""
+import json
+from contextlib import ExitStack
+from logging import getLogger
+from time import monotonic, perf_counter
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = getLogger('sos.timing')
+
+# When each slow query was last explained in this process, by its SQL
+_explained = {}
+
+
+class RequestTimings:
+    """The database and template time spent on a request."""
+
+    def __init__(self):
+        self.query_count = 0
+        self.query_time = 0.0
+        self.slowest_query = None
+        self.slowest_query_time = 0.0
+        self.slow_queries = []
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def record_query(self, execute, sql, params, many, context):
+        """Database execute wrapper that times each query."""
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - started
+            self.query_count += 1
+            self.query_time += duration
+            if duration > self.slowest_query_time:
+                self.slowest_query, self.slowest_query_time = sql, duration
+            if settings.SLOW_QUERY_MS and duration * 1000 >= settings.SLOW_QUERY_MS:
+                self.slow_queries.append((context['connection'].alias, sql, params, many, duration))
+
+
+def should_explain(sql: str) -> bool:
+    """Whether to explain a slow query, which is at most once per SLOW_QUERY_EXPLAIN_INTERVAL seconds for each SQL.
+
+    The SQL has placeholders rather than parameters, so the same query with different parameters is only explained once
+    per interval. Explaining is off when the interval is 0.
+    """
+    interval = settings.SLOW_QUERY_EXPLAIN_INTERVAL
+    if not interval:
+        return False
+
+    now = monotonic()
+    last_explained = _explained.get(sql)
+    if last_explained is not None and now - last_explained < interval:
+        return False
+    if len(_explained) >= 1000:
+        # Queries with IN lists of varying length each have their own SQL, so don't let them pile up
+        _explained.clear()
+    _explained[sql] = now
+    return True
+
+
+def explain_analyze(alias: str, sql: str, params) -> str:
+    """Get the EXPLAIN ANALYZE output for a query. This runs the query again, so it is only done for SELECTs."""
+    with connections[alias].cursor() as cursor:
+        cursor.execute(f'EXPLAIN ANALYZE {sql}', params)
+        return '\n'.join(row[0] for row in cursor.fetchall())
+
+
+class ServerTimingMiddleware:
+    """Record the queries and template rendering of each request.
+
+    Adds the query count, total SQL time, slowest statement time and template render time to the response as a
+    Server-Timing header, and logs them as a JSON line tagged with the URL name and dashboard action. Queries slower
+    than SLOW_QUERY_MS are logged with their SQL. Those that match SLOW_QUERY_EXPLAIN_PATTERNS, such as the revenue
+    annotations, can also be logged with their EXPLAIN ANALYZE output. That runs the query again before the response is
+    returned, so it is off unless SLOW_QUERY_EXPLAIN_INTERVAL is set, and then only done once per interval for each SQL.
+
+    Only queries on the request's own thread are recorded, not those the async views run on their query thread pool.
+    Should be first, so the other middleware's queries are included.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.timings = timings = RequestTimings()
+        started = perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timings.record_query))
+            response = self.get_response(request)
+        total_time = perf_counter() - started
+
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = ', '.join([
+                f'db;desc="{timings.query_count} queries";dur={timings.query_time * 1000:.1f}',
+                f'db-slowest;dur={timings.slowest_query_time * 1000:.1f}',
+                f'template;dur={timings.template_time * 1000:.1f}',
+                f'total;dur={total_time * 1000:.1f}',
+            ])
+
+        match = request.resolver_match
+        tags = {
+            'url_name': match.url_name if match else None,
+            'action': match.kwargs.get('action') if match else None,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+        }
+        logger.info(json.dumps({
+            **tags,
+            'queries': timings.query_count,
+            'db_ms': round(timings.query_time * 1000, 1),
+            'slowest_query_ms': round(timings.slowest_query_time * 1000, 1),
+            'slowest_query': timings.slowest_query,
+            'template_ms': round(timings.template_time * 1000, 1),
+            'total_ms': round(total_time * 1000, 1),
+        }))
+
+        for alias, sql, params, many, duration in timings.slow_queries:
+            self.log_slow_query(tags, alias, sql, params, many, duration)
+
+        return response
+
+    @staticmethod
+    def log_slow_query(tags: dict, alias: str, sql: str, params, many: bool, duration: float):
+        plan = None
+        explain = (
+            not many and
+            connections[alias].vendor == 'postgresql' and
+            sql.lstrip().upper().startswith('SELECT') and
+            any(pattern in sql for pattern in settings.SLOW_QUERY_EXPLAIN_PATTERNS) and
+            should_explain(sql)
+        )
+        if explain:
+            try:
+                plan = explain_analyze(alias, sql, params)
+            except Exception as e:
+                plan = f'EXPLAIN ANALYZE failed: {e}'
+
+        logger.warning(json.dumps({
+            **tags,
+            'slow_query_ms': round(duration * 1000, 1),
+            'sql': sql,
+            'params': [str(param) for param in params] if params and not many else None,
+            'plan': plan,
+        }))
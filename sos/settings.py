@@ -99,11 +99,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'sos.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'portfolio_planner.middleware.RoleScopeMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django_htmx.middleware.HtmxMiddleware',
@@ -113,7 +115,8 @@ ROOT_URLCONF = 'sos.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # The Django backend, timing template rendering for the ServerTimingMiddleware
+        'BACKEND': 'sos.templates.TimedDjangoTemplates',
         'DIRS': [
             BASE_DIR / "portfolio_planner/templates",
         ],
@@ -130,7 +133,42 @@ TEMPLATES = [
     },
 ]
 
+# Request timing
+# Adds a Server-Timing header with the query count, SQL time and template time to every response
+SERVER_TIMING_HEADER = env.bool('SERVER_TIMING_HEADER', True)
+# Queries slower than this many milliseconds are logged with their SQL. Set to 0 to disable.
+SLOW_QUERY_MS = env.int('SLOW_QUERY_MS', 500)
+# Slow queries containing any of these are logged with their EXPLAIN ANALYZE output. fiscal_year_revenue is the join
+# the Opportunity revenue annotations (with_revenue) use.
+SLOW_QUERY_EXPLAIN_PATTERNS = env.list('SLOW_QUERY_EXPLAIN_PATTERNS', default=['fiscal_year_revenue'])
+# Explaining a query runs it again, so each one is explained at most once per this many seconds. Set to 0 to disable.
+SLOW_QUERY_EXPLAIN_INTERVAL = env.int('SLOW_QUERY_EXPLAIN_INTERVAL', 0)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        # One JSON line per request with its timings, and one per slow query
+        'sos.timing': {
+            'handlers': ['console'],
+            'level': env.str('TIMING_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 WSGI_APPLICATION = 'sos.wsgi.application'
+ASGI_APPLICATION = 'sos.asgi.application'
+
+# Set when serving sos.asgi with an ASGI worker, so the async variants of the views are used. These run their
+# independent queries concurrently, on a thread pool of up to ASYNC_QUERY_WORKERS threads per process.
+ASGI = env.bool('ASGI', False)
+ASYNC_QUERY_WORKERS = env.int('ASYNC_QUERY_WORKERS', 4)
 
 
 # Database
@@ -161,6 +199,11 @@ port = env.str('DJANGO_DB_PORT', '5432')
 if port != 'unix':
     DATABASES['default']['PORT'] = port
 
+# Keep database connections open for CONN_MAX_AGE seconds, checking they still work before reusing them. This saves the
+# connection setup on every request, and on every query the async views run on their query thread pool.
+DATABASES['default']['CONN_MAX_AGE'] = env.int('CONN_MAX_AGE', 60)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
 # Fixtures
 FIXTURE_DIRS = (
     # Master Data
@@ -169,6 +212,28 @@ FIXTURE_DIRS = (
     '/portfolio_planner/tests/fixtures/'
 )
 
+# Cache
+# Defaults to a per process memory cache. Use a shared cache, such as redis://..., when running more than one process, so
+# that cache invalidation reaches every process.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# How long a user's role and visible brands are cached for, in seconds. They are also invalidated when they change.
+ROLE_SCOPE_CACHE_TIMEOUT = env.int('ROLE_SCOPE_CACHE_TIMEOUT', 300)
+
+# How long they are cached for when the cache is not shared, in which case changes made by other processes never
+# invalidate them. This is how long a revoked role or brand can still be used on another instance.
+LOCAL_ROLE_SCOPE_CACHE_TIMEOUT = env.int('LOCAL_ROLE_SCOPE_CACHE_TIMEOUT', 10)
+
+# How long the fiscal calendar is kept by each process, in seconds. It is also reloaded when a fiscal year changes, but
+# changes made by other processes are only seen immediately with a shared cache.
+FISCAL_CALENDAR_TIMEOUT = env.int('FISCAL_CALENDAR_TIMEOUT', 60)
+
+# How long rendered HTMX fragments, such as the dashboard charts, are cached for, in seconds. They are also invalidated
+# when the data they are built from changes. They are only cached when CACHE_URL is set to a shared cache.
+FRAGMENT_CACHE_TIMEOUT = env.int('FRAGMENT_CACHE_TIMEOUT', 3600)
+
 # Custom Auth User
 AUTH_USER_MODEL = 'portfolio_planner.User'
 ROLEPERMISSIONS_MODULE = 'sos.roles'
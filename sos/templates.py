@@ -0,0 +1,33 @@
+"""Template backend that times rendering for the ServerTimingMiddleware."""
+from time import perf_counter
+
+from django.template.backends.django import DjangoTemplates, Template
+
+
+class TimedTemplate(Template):
+    """A Django template that adds the time it takes to render to the request's timings."""
+
+    def render(self, context=None, request=None):
+        timings = getattr(request, 'timings', None)
+        if timings is None:
+            return super().render(context, request)
+
+        # Templates rendered from within another, such as by {% render_table %}, are already being timed
+        timings.template_depth += 1
+        started = perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings.template_depth -= 1
+            if not timings.template_depth:
+                timings.template_time += perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing how long templates take to render."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
@@ -5,8 +5,10 @@ from django.contrib.auth import views as auth_views
 from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from django.urls import path
 
+from portfolio_planner.views.dashboard import AsyncDashboardView
 from portfolio_planner.views.dashboard import DashboardView
 from portfolio_planner.views.health import health_check_view
+from portfolio_planner.views.home import AsyncHomeOrLoginView
 from portfolio_planner.views.home import HomeOrLoginView
 from portfolio_planner.views.opportunity import approve_opportunity
 from portfolio_planner.views.opportunity import PortfolioPlannerView
@@ -18,6 +20,10 @@ from portfolio_planner.views.opportunity import filtered_brands
 from portfolio_planner.views.opportunity import filtered_business_units
 from portfolio_planner.views.registration import CustomPasswordResetView
 
+# Under ASGI, serve the async variants of the views that run their queries concurrently
+home_view = AsyncHomeOrLoginView if settings.ASGI else HomeOrLoginView
+dashboard_view = AsyncDashboardView if settings.ASGI else DashboardView
+
 urlpatterns = [
     # Auth
     path(
@@ -64,10 +70,10 @@ urlpatterns = [
     ),
     # Site URLs
     # home
-    path('', HomeOrLoginView.as_view(), name='home'),
+    path('', home_view.as_view(), name='home'),
     # Dashboard
-    path('dashboard/', DashboardView.as_view(), name='dashboard'),
-    path('dashboard/<str:action>/', DashboardView.as_view(), name='dashboard_action'),
+    path('dashboard/', dashboard_view.as_view(), name='dashboard'),
+    path('dashboard/<str:action>/', dashboard_view.as_view(), name='dashboard_action'),
     # Portfolio Planner
     path('portfolio-planner/', PortfolioPlannerView.as_view(), name='portfolio_planner'),
     path('opportunities/', OpportunityListView.as_view(), name='opportunity_list'),